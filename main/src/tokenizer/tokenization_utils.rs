@@ -641,23 +641,20 @@ pub fn truncate_sequences(
                         if token_ids_with_offsets_1.ids.len()
                             >= token_ids_with_offsets_2_value.ids.len()
                         {
-                            overflow_tokens.insert(0, token_ids_with_offsets_1.ids.pop().unwrap());
+                            overflow_tokens.push(token_ids_with_offsets_1.ids.pop().unwrap());
                             if !token_ids_with_offsets_1.offsets.is_empty() {
                                 overflow_offsets
-                                    .insert(0, token_ids_with_offsets_1.offsets.pop().unwrap());
+                                    .push(token_ids_with_offsets_1.offsets.pop().unwrap());
                             }
                             token_ids_with_offsets_1.reference_offsets.pop();
                             if !token_ids_with_offsets_1.masks.is_empty() {
                                 token_ids_with_offsets_1.masks.pop();
                             }
                         } else {
-                            overflow_tokens
-                                .insert(0, token_ids_with_offsets_2_value.ids.pop().unwrap());
+                            overflow_tokens.push(token_ids_with_offsets_2_value.ids.pop().unwrap());
                             if !token_ids_with_offsets_2_value.offsets.is_empty() {
-                                overflow_offsets.insert(
-                                    0,
-                                    token_ids_with_offsets_2_value.offsets.pop().unwrap(),
-                                );
+                                overflow_offsets
+                                    .push(token_ids_with_offsets_2_value.offsets.pop().unwrap());
                             }
                             token_ids_with_offsets_2_value.reference_offsets.pop();
                             if !token_ids_with_offsets_2_value.masks.is_empty() {
@@ -665,6 +662,9 @@ pub fn truncate_sequences(
                             }
                         }
                     }
+                    // Tokens were popped from the end of the sequences: restore the original order
+                    overflow_tokens.reverse();
+                    overflow_offsets.reverse();
                     let window_len = min(token_ids_with_offsets_1.ids.len(), stride);
                     if window_len > 0 {
                         let slice: &[i64] = &token_ids_with_offsets_1.ids
@@ -2163,6 +2163,72 @@ mod tests {
         }
     }
 
+    #[test]
+    fn test_truncate_sentence_pair_longest_first_overflow_order() {
+        //        Given
+        let token_ids_with_offsets_1 = TokenIdsWithOffsets {
+            ids: (0..6).collect::<Vec<i64>>(),
+            offsets: (0..6).map(|pos| Some(Offset::new(pos, pos + 1))).collect(),
+            reference_offsets: (0..6).map(|pos| vec![pos]).collect(),
+            masks: vec![Mask::None; 6],
+        };
+        let token_ids_with_offsets_2 = TokenIdsWithOffsets {
+            ids: (42..46).collect::<Vec<i64>>(),
+            offsets: (10..14)
+                .map(|pos| Some(Offset::new(pos, pos + 1)))
+                .collect(),
+            reference_offsets: (10..14).map(|pos| vec![pos]).collect(),
+            masks: vec![Mask::None; 4],
+        };
+
+        //        When
+        let (truncated_1, truncated_2, overflow_tokens, overflow_offsets) = truncate_sequences(
+            token_ids_with_offsets_1,
+            Some(token_ids_with_offsets_2),
+            5,
+            &TruncationStrategy::LongestFirst,
+            2,
+        )
+        .unwrap();
+
+        //        Then
+        assert_eq!(
+            truncated_1,
+            TokenIdsWithOffsets {
+                ids: vec![0, 1],
+                offsets: vec![Some(Offset::new(0, 1)), Some(Offset::new(1, 2))],
+                reference_offsets: vec![vec![0], vec![1]],
+                masks: vec![Mask::None; 2],
+            }
+        );
+        assert_eq!(
+            truncated_2,
+            Some(TokenIdsWithOffsets {
+                ids: vec![42, 43, 44],
+                offsets: (10..13)
+                    .map(|pos| Some(Offset::new(pos, pos + 1)))
+                    .collect(),
+                reference_offsets: vec![vec![10], vec![11], vec![12]],
+                masks: vec![Mask::None; 3],
+            })
+        );
+        //        The stride window of the first sequence comes first, followed by the removed tokens of
+        //        both sequences in their original order
+        assert_eq!(overflow_tokens, vec![0, 1, 2, 45, 3, 4, 5]);
+        assert_eq!(
+            overflow_offsets,
+            vec![
+                Some(Offset::new(0, 1)),
+                Some(Offset::new(1, 2)),
+                Some(Offset::new(2, 3)),
+                Some(Offset::new(13, 14)),
+                Some(Offset::new(3, 4)),
+                Some(Offset::new(4, 5)),
+                Some(Offset::new(5, 6)),
+            ]
+        );
+    }
+
     #[test]
     fn test_truncate_sentence_pair_first_only() {
         //        Given
@@ -1,9 +1,5 @@
-from .rust_tokenizers import PyBertTokenizer, PyCtrlTokenizer, PyGpt2Tokenizer, PyRobertaTokenizer, \
-    PyOpenAiGptTokenizer, PySentencePieceTokenizer, PySentencePieceBpeTokenizer, PyAlbertTokenizer, PyT5Tokenizer, \
-    PyXLMRobertaTokenizer, PyXLNetTokenizer, PyReformerTokenizer, PyProphetNetTokenizer, PyPegasusTokenizer, \
-    PyMBart50Tokenizer, PyM2M100Tokenizer
+from . import rust_tokenizers as _rust_tokenizers
 
-__all__ = ["PyBertTokenizer", "PyCtrlTokenizer", "PyGpt2Tokenizer", "PyRobertaTokenizer",
-           "PyOpenAiGptTokenizer", "PySentencePieceTokenizer", "PySentencePieceBpeTokenizer","PyAlbertTokenizer",
-           "PyT5Tokenizer", "PyXLMRobertaTokenizer", "PyXLNetTokenizer", "PyReformerTokenizer", "PyProphetNetTokenizer",
-           "PyPegasusTokenizer", "PyMBart50Tokenizer", "PyM2M100Tokenizer"]
+# Every tokenizer class registered by the extension module is re-exported at the package level
+__all__ = [name for name in _rust_tokenizers.__all__ if name.startswith("Py") and name.endswith("Tokenizer")]
+globals().update({name: getattr(_rust_tokenizers, name) for name in __all__})
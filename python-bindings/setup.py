@@ -1,4 +1,5 @@
 import os
+import re
 from setuptools import setup
 from setuptools.command.test import test as TestCommand
 from setuptools.command.sdist import sdist as SdistCommand
@@ -18,37 +19,41 @@ except ImportError:
 
 
 class CargoModifiedSdist(SdistCommand):
-    """Modifies Cargo.toml to use an absolute rather than a relative path
+    """Modifies Cargo.toml to use absolute rather than relative dependency paths
     The current implementation of PEP 517 in pip always does builds in an
     isolated temporary directory. This causes problems with the build, because
-    Cargo.toml necessarily refers to the current version of pyo3 by a relative
-    path.
+    Cargo.toml necessarily refers to local dependencies by a relative path.
     Since these sdists are never meant to be used for anything other than
     tox / pip installs, at sdist build time, we will modify the Cargo.toml
-    in the sdist archive to include an *absolute* path to pyo3.
+    in the sdist archive to include *absolute* dependency paths.
     """
 
     def make_release_tree(self, base_dir, files):
         """Stages the files to be included in archives"""
         super().make_release_tree(base_dir, files)
 
-        import toml
-
         # Cargo.toml is now staged and ready to be modified
         cargo_loc = os.path.join(base_dir, "Cargo.toml")
         assert os.path.exists(cargo_loc)
 
         with open(cargo_loc, "r") as f:
-            cargo_toml = toml.load(f)
+            cargo_toml = f.read()
+
+        base_path = os.path.dirname(os.path.abspath(__file__))
 
-        rel_pyo3_path = cargo_toml["dependencies"]["pyo3"]["path"]
-        base_path = os.path.dirname(__file__)
-        abs_pyo3_path = os.path.abspath(os.path.join(base_path, rel_pyo3_path))
+        def to_absolute_path(match):
+            return match.group(1) + os.path.abspath(os.path.join(base_path, match.group(2))) + match.group(3)
 
-        cargo_toml["dependencies"]["pyo3"]["path"] = abs_pyo3_path
+        # Only dependency paths are rewritten, the `[lib]` path stays relative to the crate root
+        sections = re.split(r"(?m)^(?=\[)", cargo_toml)
+        cargo_toml = "".join(
+            re.sub(r'(\bpath\s*=\s*")([^"]+)(")', to_absolute_path, section)
+            if section.startswith("[dependencies") else section
+            for section in sections
+        )
 
         with open(cargo_loc, "w") as f:
-            toml.dump(cargo_toml, f)
+            f.write(cargo_toml)
 
 
 class PyTest(TestCommand):
@@ -63,7 +68,8 @@ class PyTest(TestCommand):
 
 
 setup_requires = ["setuptools-rust>=0.12.1", "wheel"]
-test_requires = ["pytest", "pytest-benchmark", "torch>=1.8.1", "transformers==4.6.1"]
+install_requires = ["numpy"]
+test_requires = ["pytest", "pytest-benchmark", "torch>=1.9.0", "transformers==4.6.1"]
 
 setup(
     name="rust_tokenizers",
@@ -71,6 +77,7 @@ setup(
     packages=["rust_tokenizers"],
     rust_extensions=[RustExtension("rust_tokenizers.rust_tokenizers", "Cargo.toml", debug=False)],
     setup_requires=setup_requires,
+    install_requires=install_requires,
     test_requires=test_requires,
     include_package_data=True,
     zip_safe=False,
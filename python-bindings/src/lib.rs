@@ -1,5 +1,10 @@
+#[macro_use]
+extern crate lazy_static;
+
+use numpy::{PyArray1, PyArray2};
 use pyo3::exceptions;
 use pyo3::prelude::*;
+use rayon::prelude::*;
 use rust_tokenizers::tokenizer::{
     AlbertTokenizer, BertTokenizer, CtrlTokenizer, Gpt2Tokenizer, M2M100Tokenizer,
     MBart50Tokenizer, MultiThreadedTokenizer, OpenAiGptTokenizer, PegasusTokenizer,
@@ -12,6 +17,10 @@ use rust_tokenizers::vocab::{
     ProphetNetVocab, ReformerVocab, RobertaVocab, SentencePieceVocab, T5Vocab, Vocab,
     XLMRobertaVocab, XLNetVocab,
 };
+use rust_tokenizers::TokenizedInput;
+use std::collections::hash_map::Entry;
+use std::collections::HashMap;
+use std::sync::{Arc, Mutex};
 
 #[pyclass]
 #[derive(Debug, PartialEq, PartialOrd, Clone)]
@@ -28,6 +37,129 @@ pub struct PyTokenizedInput {
     pub num_truncated_tokens: usize,
 }
 
+lazy_static! {
+    // Thread pools are built once per size and kept for the lifetime of the module, so that repeated batch calls
+    // do not spawn and join their worker threads every time
+    static ref THREAD_POOLS: Mutex<HashMap<usize, Arc<rayon::ThreadPool>>> = Mutex::new(HashMap::new());
+}
+
+fn install_thread_pool<F, R>(num_threads: usize, op: F) -> PyResult<R>
+where
+    F: FnOnce() -> R + Send,
+    R: Send,
+{
+    if num_threads == rayon::current_num_threads() {
+        return Ok(op());
+    }
+    let thread_pool = {
+        let mut thread_pools = THREAD_POOLS
+            .lock()
+            .unwrap_or_else(|poisoned| poisoned.into_inner());
+        match thread_pools.entry(num_threads) {
+            Entry::Occupied(entry) => entry.get().clone(),
+            Entry::Vacant(entry) => {
+                match rayon::ThreadPoolBuilder::new()
+                    .num_threads(num_threads)
+                    .build()
+                {
+                    Ok(thread_pool) => entry.insert(Arc::new(thread_pool)).clone(),
+                    Err(e) => return Err(exceptions::PyRuntimeError::new_err(e.to_string())),
+                }
+            }
+        }
+    };
+    Ok(thread_pool.install(op))
+}
+
+fn encode_list_with_num_threads<T: MultiThreadedTokenizer<U>, U: Vocab>(
+    tokenizer: &T,
+    text_list: Vec<&str>,
+    max_len: usize,
+    truncation_strategy: &TruncationStrategy,
+    stride: usize,
+    num_threads: Option<usize>,
+) -> PyResult<Vec<TokenizedInput>> {
+    Ok(match num_threads {
+        Some(1) => {
+            Tokenizer::encode_list(tokenizer, text_list, max_len, truncation_strategy, stride)
+        }
+        Some(num_threads) => install_thread_pool(num_threads, || {
+            MultiThreadedTokenizer::encode_list(
+                tokenizer,
+                text_list,
+                max_len,
+                truncation_strategy,
+                stride,
+            )
+        })?,
+        None => MultiThreadedTokenizer::encode_list(
+            tokenizer,
+            text_list,
+            max_len,
+            truncation_strategy,
+            stride,
+        ),
+    })
+}
+
+fn encode_pair_list_with_num_threads<T: MultiThreadedTokenizer<U>, U: Vocab>(
+    tokenizer: &T,
+    text_list: Vec<(&str, &str)>,
+    max_len: usize,
+    truncation_strategy: &TruncationStrategy,
+    stride: usize,
+    num_threads: Option<usize>,
+) -> PyResult<Vec<TokenizedInput>> {
+    Ok(match num_threads {
+        Some(1) => {
+            Tokenizer::encode_pair_list(tokenizer, text_list, max_len, truncation_strategy, stride)
+        }
+        Some(num_threads) => install_thread_pool(num_threads, || {
+            MultiThreadedTokenizer::encode_pair_list(
+                tokenizer,
+                text_list,
+                max_len,
+                truncation_strategy,
+                stride,
+            )
+        })?,
+        None => MultiThreadedTokenizer::encode_pair_list(
+            tokenizer,
+            text_list,
+            max_len,
+            truncation_strategy,
+            stride,
+        ),
+    })
+}
+
+fn encode_list_map_with_num_threads<T, U, F, R>(
+    tokenizer: &T,
+    text_list: Vec<&str>,
+    max_len: usize,
+    truncation_strategy: &TruncationStrategy,
+    stride: usize,
+    num_threads: Option<usize>,
+    map_fn: F,
+) -> PyResult<Vec<R>>
+where
+    T: MultiThreadedTokenizer<U>,
+    U: Vocab,
+    F: Fn(TokenizedInput) -> R + Sync + Send,
+    R: Send,
+{
+    // Only the fields kept by `map_fn` are collected, the rest of each encoding is dropped by its worker
+    let encode =
+        |text: &&str| map_fn(tokenizer.encode(*text, None, max_len, truncation_strategy, stride));
+    Ok(match num_threads {
+        Some(1) => text_list.iter().map(encode).collect(),
+        Some(num_threads) => {
+            install_thread_pool(num_threads, || text_list.par_iter().map(encode).collect())?
+        }
+        None => text_list.par_iter().map(encode).collect(),
+    })
+}
+
 trait PyTokenizer<T: Tokenizer<U>, U: Vocab> {
     fn tokenizer(&self) -> &T;
 
@@ -41,11 +173,15 @@ trait PyTokenizer<T: Tokenizer<U>, U: Vocab> {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
-    ) -> PyResult<PyTokenizedInput> {
+    ) -> PyResult<PyTokenizedInput>
+    where
+        T: Sync,
+    {
         let truncation_strategy = match truncation_strategy {
             "longest_first" => Ok(TruncationStrategy::LongestFirst),
             "only_first" => Ok(TruncationStrategy::OnlyFirst),
@@ -55,9 +191,10 @@ trait PyTokenizer<T: Tokenizer<U>, U: Vocab> {
         };
         match truncation_strategy {
             Ok(truncation_strategy) => {
-                let tokenized_input =
-                    self.tokenizer()
-                        .encode(&text, None, max_len, &truncation_strategy, stride);
+                let tokenizer = self.tokenizer();
+                let tokenized_input = py.allow_threads(|| {
+                    tokenizer.encode(&text, None, max_len, &truncation_strategy, stride)
+                });
                 Ok(PyTokenizedInput {
                     token_ids: tokenized_input.token_ids,
                     segment_ids: tokenized_input.segment_ids,
@@ -72,12 +209,16 @@ trait PyTokenizer<T: Tokenizer<U>, U: Vocab> {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
-    ) -> PyResult<PyTokenizedInput> {
+    ) -> PyResult<PyTokenizedInput>
+    where
+        T: Sync,
+    {
         let truncation_strategy = match truncation_strategy {
             "longest_first" => Ok(TruncationStrategy::LongestFirst),
             "only_first" => Ok(TruncationStrategy::OnlyFirst),
@@ -87,13 +228,16 @@ trait PyTokenizer<T: Tokenizer<U>, U: Vocab> {
         };
         match truncation_strategy {
             Ok(truncation_strategy) => {
-                let tokenized_input = self.tokenizer().encode(
-                    &text_a,
-                    Some(&text_b),
-                    max_len,
-                    &truncation_strategy,
-                    stride,
-                );
+                let tokenizer = self.tokenizer();
+                let tokenized_input = py.allow_threads(|| {
+                    tokenizer.encode(
+                        &text_a,
+                        Some(&text_b),
+                        max_len,
+                        &truncation_strategy,
+                        stride,
+                    )
+                });
                 Ok(PyTokenizedInput {
                     token_ids: tokenized_input.token_ids,
                     segment_ids: tokenized_input.segment_ids,
@@ -194,10 +338,12 @@ where
 
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         let truncation_strategy = match truncation_strategy {
             "longest_first" => Ok(TruncationStrategy::LongestFirst),
@@ -208,23 +354,27 @@ where
         };
         match truncation_strategy {
             Ok(truncation_strategy) => {
-                let tokenized_inputs = MultiThreadedTokenizer::encode_list(
-                    self.tokenizer(),
-                    text_list,
-                    max_len,
-                    &truncation_strategy,
-                    stride,
-                );
-                Ok(tokenized_inputs
-                    .into_iter()
-                    .map(|tokenized_input| PyTokenizedInput {
-                        token_ids: tokenized_input.token_ids,
-                        segment_ids: tokenized_input.segment_ids,
-                        special_tokens_mask: tokenized_input.special_tokens_mask,
-                        overflowing_tokens: tokenized_input.overflowing_tokens,
-                        num_truncated_tokens: tokenized_input.num_truncated_tokens,
-                    })
-                    .collect::<Vec<PyTokenizedInput>>())
+                let tokenizer = self.tokenizer();
+                py.allow_threads(|| {
+                    let tokenized_inputs = encode_list_with_num_threads::<T, U>(
+                        tokenizer,
+                        text_list,
+                        max_len,
+                        &truncation_strategy,
+                        stride,
+                        num_threads,
+                    )?;
+                    Ok(tokenized_inputs
+                        .into_iter()
+                        .map(|tokenized_input| PyTokenizedInput {
+                            token_ids: tokenized_input.token_ids,
+                            segment_ids: tokenized_input.segment_ids,
+                            special_tokens_mask: tokenized_input.special_tokens_mask,
+                            overflowing_tokens: tokenized_input.overflowing_tokens,
+                            num_truncated_tokens: tokenized_input.num_truncated_tokens,
+                        })
+                        .collect::<Vec<PyTokenizedInput>>())
+                })
             }
             Err(e) => Err(exceptions::PyValueError::new_err(e)),
         }
@@ -232,10 +382,12 @@ where
 
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         let truncation_strategy = match truncation_strategy {
             "longest_first" => Ok(TruncationStrategy::LongestFirst),
@@ -246,27 +398,195 @@ where
         };
         match truncation_strategy {
             Ok(truncation_strategy) => {
-                let tokenized_inputs = MultiThreadedTokenizer::encode_pair_list(
-                    self.tokenizer(),
+                let tokenizer = self.tokenizer();
+                py.allow_threads(|| {
+                    let tokenized_inputs = encode_pair_list_with_num_threads::<T, U>(
+                        tokenizer,
+                        text_list,
+                        max_len,
+                        &truncation_strategy,
+                        stride,
+                        num_threads,
+                    )?;
+                    Ok(tokenized_inputs
+                        .into_iter()
+                        .map(|tokenized_input| PyTokenizedInput {
+                            token_ids: tokenized_input.token_ids,
+                            segment_ids: tokenized_input.segment_ids,
+                            special_tokens_mask: tokenized_input.special_tokens_mask,
+                            overflowing_tokens: tokenized_input.overflowing_tokens,
+                            num_truncated_tokens: tokenized_input.num_truncated_tokens,
+                        })
+                        .collect::<Vec<PyTokenizedInput>>())
+                })
+            }
+            Err(e) => Err(exceptions::PyValueError::new_err(e)),
+        }
+    }
+
+    fn encode_list_padded<'py>(
+        &self,
+        py: Python<'py>,
+        text_list: Vec<&str>,
+        max_len: usize,
+        truncation_strategy: &str,
+        stride: usize,
+        pad_id: i64,
+        num_threads: Option<usize>,
+    ) -> PyResult<&'py PyArray2<i64>> {
+        let truncation_strategy = match truncation_strategy {
+            "longest_first" => Ok(TruncationStrategy::LongestFirst),
+            "only_first" => Ok(TruncationStrategy::OnlyFirst),
+            "only_second" => Ok(TruncationStrategy::OnlySecond),
+            "do_not_truncate" => Ok(TruncationStrategy::DoNotTruncate),
+            _ => Err("Invalid truncation strategy provided. Must be one of `longest_first`, `only_first`, `only_second` or `do_not_truncate`")
+        };
+        match truncation_strategy {
+            Ok(truncation_strategy) => {
+                let tokenizer = self.tokenizer();
+                let num_rows = text_list.len();
+                let (padded_ids, num_columns) = py.allow_threads(|| -> PyResult<_> {
+                    let token_ids = encode_list_map_with_num_threads::<T, U, _, _>(
+                        tokenizer,
+                        text_list,
+                        max_len,
+                        &truncation_strategy,
+                        stride,
+                        num_threads,
+                        |tokenized_input| tokenized_input.token_ids,
+                    )?;
+                    let num_columns = token_ids.iter().map(Vec::len).max().unwrap_or(0);
+                    let mut padded_ids = Vec::with_capacity(num_rows * num_columns);
+                    for row_ids in token_ids.iter() {
+                        padded_ids.extend_from_slice(row_ids);
+                        padded_ids.resize(padded_ids.len() + num_columns - row_ids.len(), pad_id);
+                    }
+                    Ok((padded_ids, num_columns))
+                })?;
+                PyArray1::from_vec(py, padded_ids).reshape([num_rows, num_columns])
+            }
+            Err(e) => Err(exceptions::PyValueError::new_err(e)),
+        }
+    }
+
+    fn encode_list_padded_with_masks<'py>(
+        &self,
+        py: Python<'py>,
+        text_list: Vec<&str>,
+        max_len: usize,
+        truncation_strategy: &str,
+        stride: usize,
+        pad_id: i64,
+        num_threads: Option<usize>,
+    ) -> PyResult<(&'py PyArray2<i64>, &'py PyArray2<i8>, &'py PyArray2<i8>)> {
+        let truncation_strategy = match truncation_strategy {
+            "longest_first" => Ok(TruncationStrategy::LongestFirst),
+            "only_first" => Ok(TruncationStrategy::OnlyFirst),
+            "only_second" => Ok(TruncationStrategy::OnlySecond),
+            "do_not_truncate" => Ok(TruncationStrategy::DoNotTruncate),
+            _ => Err("Invalid truncation strategy provided. Must be one of `longest_first`, `only_first`, `only_second` or `do_not_truncate`")
+        };
+        match truncation_strategy {
+            Ok(truncation_strategy) => {
+                let tokenizer = self.tokenizer();
+                let num_rows = text_list.len();
+                let (padded_ids, attention_mask, segment_ids, num_columns) =
+                    py.allow_threads(|| -> PyResult<_> {
+                        let encodings = encode_list_map_with_num_threads::<T, U, _, _>(
+                            tokenizer,
+                            text_list,
+                            max_len,
+                            &truncation_strategy,
+                            stride,
+                            num_threads,
+                            |tokenized_input| {
+                                (tokenized_input.token_ids, tokenized_input.segment_ids)
+                            },
+                        )?;
+                        let num_columns = encodings
+                            .iter()
+                            .map(|(row_ids, _)| row_ids.len())
+                            .max()
+                            .unwrap_or(0);
+                        let mut padded_ids = Vec::with_capacity(num_rows * num_columns);
+                        let mut attention_mask = Vec::with_capacity(num_rows * num_columns);
+                        let mut segment_ids = Vec::with_capacity(num_rows * num_columns);
+                        for (row_ids, row_segment_ids) in encodings.iter() {
+                            let sequence_length = row_ids.len();
+                            let padding_length = num_columns - sequence_length;
+                            padded_ids.extend_from_slice(row_ids);
+                            padded_ids.resize(padded_ids.len() + padding_length, pad_id);
+                            attention_mask.resize(attention_mask.len() + sequence_length, 1);
+                            attention_mask.resize(attention_mask.len() + padding_length, 0);
+                            segment_ids.extend_from_slice(row_segment_ids);
+                            segment_ids.resize(segment_ids.len() + padding_length, 0);
+                        }
+                        Ok((padded_ids, attention_mask, segment_ids, num_columns))
+                    })?;
+                Ok((
+                    PyArray1::from_vec(py, padded_ids).reshape([num_rows, num_columns])?,
+                    PyArray1::from_vec(py, attention_mask).reshape([num_rows, num_columns])?,
+                    PyArray1::from_vec(py, segment_ids).reshape([num_rows, num_columns])?,
+                ))
+            }
+            Err(e) => Err(exceptions::PyValueError::new_err(e)),
+        }
+    }
+}
+
+// The padded batch methods are identical for every tokenizer: each class gets them in a
+// `#[pymethods]` block of its own, generated here rather than repeated in every class body.
+macro_rules! padded_pymethods {
+    ($py_tokenizer:ident, $tokenizer:ty, $vocab:ty) => {
+        #[pymethods]
+        impl $py_tokenizer {
+            #[args(pad_id = "0", num_threads = "None")]
+            fn encode_list_padded<'py>(
+                &self,
+                py: Python<'py>,
+                text_list: Vec<&str>,
+                max_len: usize,
+                truncation_strategy: &str,
+                stride: usize,
+                pad_id: i64,
+                num_threads: Option<usize>,
+            ) -> PyResult<&'py PyArray2<i64>> {
+                <Self as PyMultiThreadTokenizer<$tokenizer, $vocab>>::encode_list_padded(
+                    &self,
+                    py,
                     text_list,
                     max_len,
-                    &truncation_strategy,
+                    truncation_strategy,
                     stride,
-                );
-                Ok(tokenized_inputs
-                    .into_iter()
-                    .map(|tokenized_input| PyTokenizedInput {
-                        token_ids: tokenized_input.token_ids,
-                        segment_ids: tokenized_input.segment_ids,
-                        special_tokens_mask: tokenized_input.special_tokens_mask,
-                        overflowing_tokens: tokenized_input.overflowing_tokens,
-                        num_truncated_tokens: tokenized_input.num_truncated_tokens,
-                    })
-                    .collect::<Vec<PyTokenizedInput>>())
+                    pad_id,
+                    num_threads,
+                )
+            }
+
+            #[args(pad_id = "0", num_threads = "None")]
+            fn encode_list_padded_with_masks<'py>(
+                &self,
+                py: Python<'py>,
+                text_list: Vec<&str>,
+                max_len: usize,
+                truncation_strategy: &str,
+                stride: usize,
+                pad_id: i64,
+                num_threads: Option<usize>,
+            ) -> PyResult<(&'py PyArray2<i64>, &'py PyArray2<i8>, &'py PyArray2<i8>)> {
+                <Self as PyMultiThreadTokenizer<$tokenizer, $vocab>>::encode_list_padded_with_masks(
+                    &self,
+                    py,
+                    text_list,
+                    max_len,
+                    truncation_strategy,
+                    stride,
+                    pad_id,
+                    num_threads,
+                )
             }
-            Err(e) => Err(exceptions::PyValueError::new_err(e)),
         }
-    }
+    };
 }
 
 #[pyclass(dict, module = "rust_tokenizers")]
@@ -302,6 +622,7 @@ impl PyBertTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -309,6 +630,7 @@ impl PyBertTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<BertTokenizer, BertVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -318,6 +640,7 @@ impl PyBertTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -326,6 +649,7 @@ impl PyBertTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<BertTokenizer, BertVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -334,39 +658,51 @@ impl PyBertTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<BertTokenizer, BertVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<BertTokenizer, BertVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyBertTokenizer, BertTokenizer, BertVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyCtrlTokenizer {
     tokenizer: CtrlTokenizer,
@@ -406,6 +742,7 @@ impl PyCtrlTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -413,6 +750,7 @@ impl PyCtrlTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<CtrlTokenizer, OpenAiGptVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -422,6 +760,7 @@ impl PyCtrlTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -430,6 +769,7 @@ impl PyCtrlTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<CtrlTokenizer, OpenAiGptVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -438,39 +778,51 @@ impl PyCtrlTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<CtrlTokenizer, OpenAiGptVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<CtrlTokenizer, OpenAiGptVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyCtrlTokenizer, CtrlTokenizer, OpenAiGptVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyGpt2Tokenizer {
     tokenizer: Gpt2Tokenizer,
@@ -508,6 +860,7 @@ impl PyGpt2Tokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -515,6 +868,7 @@ impl PyGpt2Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<Gpt2Tokenizer, Gpt2Vocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -524,6 +878,7 @@ impl PyGpt2Tokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -532,6 +887,7 @@ impl PyGpt2Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<Gpt2Tokenizer, Gpt2Vocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -540,39 +896,51 @@ impl PyGpt2Tokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<Gpt2Tokenizer, Gpt2Vocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<Gpt2Tokenizer, Gpt2Vocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyGpt2Tokenizer, Gpt2Tokenizer, Gpt2Vocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyRobertaTokenizer {
     tokenizer: RobertaTokenizer,
@@ -618,6 +986,7 @@ impl PyRobertaTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -625,6 +994,7 @@ impl PyRobertaTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<RobertaTokenizer, RobertaVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -634,6 +1004,7 @@ impl PyRobertaTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -642,6 +1013,7 @@ impl PyRobertaTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<RobertaTokenizer, RobertaVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -650,39 +1022,51 @@ impl PyRobertaTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<RobertaTokenizer, RobertaVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<RobertaTokenizer, RobertaVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyRobertaTokenizer, RobertaTokenizer, RobertaVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyOpenAiGptTokenizer {
     tokenizer: OpenAiGptTokenizer,
@@ -722,6 +1106,7 @@ impl PyOpenAiGptTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -729,6 +1114,7 @@ impl PyOpenAiGptTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<OpenAiGptTokenizer, OpenAiGptVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -738,6 +1124,7 @@ impl PyOpenAiGptTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -746,6 +1133,7 @@ impl PyOpenAiGptTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<OpenAiGptTokenizer, OpenAiGptVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -754,39 +1142,51 @@ impl PyOpenAiGptTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<OpenAiGptTokenizer, OpenAiGptVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<OpenAiGptTokenizer, OpenAiGptVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyOpenAiGptTokenizer, OpenAiGptTokenizer, OpenAiGptVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PySentencePieceTokenizer {
     tokenizer: SentencePieceTokenizer,
@@ -824,6 +1224,7 @@ impl PySentencePieceTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -831,6 +1232,7 @@ impl PySentencePieceTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<SentencePieceTokenizer, SentencePieceVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -840,6 +1242,7 @@ impl PySentencePieceTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -848,6 +1251,7 @@ impl PySentencePieceTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<SentencePieceTokenizer, SentencePieceVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -856,33 +1260,47 @@ impl PySentencePieceTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<SentencePieceTokenizer, SentencePieceVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
-        <Self as PyMultiThreadTokenizer<SentencePieceTokenizer, SentencePieceVocab>>::encode_pair_list(&self, text_list, max_len, truncation_strategy, stride)
+        <Self as PyMultiThreadTokenizer<SentencePieceTokenizer, SentencePieceVocab>>::encode_pair_list(&self, py, text_list, max_len, truncation_strategy, stride, num_threads)
     }
 }
 
+padded_pymethods!(
+    PySentencePieceTokenizer,
+    SentencePieceTokenizer,
+    SentencePieceVocab,
+);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyAlbertTokenizer {
     tokenizer: AlbertTokenizer,
@@ -918,6 +1336,7 @@ impl PyAlbertTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -925,6 +1344,7 @@ impl PyAlbertTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<AlbertTokenizer, AlbertVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -934,6 +1354,7 @@ impl PyAlbertTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -942,6 +1363,7 @@ impl PyAlbertTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<AlbertTokenizer, AlbertVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -950,39 +1372,51 @@ impl PyAlbertTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<AlbertTokenizer, AlbertVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<AlbertTokenizer, AlbertVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyAlbertTokenizer, AlbertTokenizer, AlbertVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyXLNetTokenizer {
     tokenizer: XLNetTokenizer,
@@ -1018,6 +1452,7 @@ impl PyXLNetTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1025,6 +1460,7 @@ impl PyXLNetTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<XLNetTokenizer, XLNetVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1034,6 +1470,7 @@ impl PyXLNetTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1042,6 +1479,7 @@ impl PyXLNetTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<XLNetTokenizer, XLNetVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1050,39 +1488,51 @@ impl PyXLNetTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<XLNetTokenizer, XLNetVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<XLNetTokenizer, XLNetVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyXLNetTokenizer, XLNetTokenizer, XLNetVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyT5Tokenizer {
     tokenizer: T5Tokenizer,
@@ -1115,6 +1565,7 @@ impl PyT5Tokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1122,6 +1573,7 @@ impl PyT5Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<T5Tokenizer, T5Vocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1131,6 +1583,7 @@ impl PyT5Tokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1139,6 +1592,7 @@ impl PyT5Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<T5Tokenizer, T5Vocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1147,39 +1601,51 @@ impl PyT5Tokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<T5Tokenizer, T5Vocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<T5Tokenizer, T5Vocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyT5Tokenizer, T5Tokenizer, T5Vocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyXLMRobertaTokenizer {
     tokenizer: XLMRobertaTokenizer,
@@ -1214,6 +1680,7 @@ impl PyXLMRobertaTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1221,6 +1688,7 @@ impl PyXLMRobertaTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<XLMRobertaTokenizer, XLMRobertaVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1230,6 +1698,7 @@ impl PyXLMRobertaTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1238,6 +1707,7 @@ impl PyXLMRobertaTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<XLMRobertaTokenizer, XLMRobertaVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1246,39 +1716,51 @@ impl PyXLMRobertaTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<XLMRobertaTokenizer, XLMRobertaVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<XLMRobertaTokenizer, XLMRobertaVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyXLMRobertaTokenizer, XLMRobertaTokenizer, XLMRobertaVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyReformerTokenizer {
     tokenizer: ReformerTokenizer,
@@ -1313,6 +1795,7 @@ impl PyReformerTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1320,6 +1803,7 @@ impl PyReformerTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<ReformerTokenizer, ReformerVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1329,6 +1813,7 @@ impl PyReformerTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1337,6 +1822,7 @@ impl PyReformerTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<ReformerTokenizer, ReformerVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1345,39 +1831,51 @@ impl PyReformerTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<ReformerTokenizer, ReformerVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<ReformerTokenizer, ReformerVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyReformerTokenizer, ReformerTokenizer, ReformerVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyProphetNetTokenizer {
     tokenizer: ProphetNetTokenizer,
@@ -1413,6 +1911,7 @@ impl PyProphetNetTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1420,6 +1919,7 @@ impl PyProphetNetTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<ProphetNetTokenizer, ProphetNetVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1429,6 +1929,7 @@ impl PyProphetNetTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1437,6 +1938,7 @@ impl PyProphetNetTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<ProphetNetTokenizer, ProphetNetVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1445,39 +1947,51 @@ impl PyProphetNetTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<ProphetNetTokenizer, ProphetNetVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<ProphetNetTokenizer, ProphetNetVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyProphetNetTokenizer, ProphetNetTokenizer, ProphetNetVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyPegasusTokenizer {
     tokenizer: PegasusTokenizer,
@@ -1512,6 +2026,7 @@ impl PyPegasusTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1519,6 +2034,7 @@ impl PyPegasusTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<PegasusTokenizer, PegasusVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1528,6 +2044,7 @@ impl PyPegasusTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1536,6 +2053,7 @@ impl PyPegasusTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<PegasusTokenizer, PegasusVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1544,39 +2062,51 @@ impl PyPegasusTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<PegasusTokenizer, PegasusVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<PegasusTokenizer, PegasusVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyPegasusTokenizer, PegasusTokenizer, PegasusVocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyMBart50Tokenizer {
     tokenizer: MBart50Tokenizer,
@@ -1611,6 +2141,7 @@ impl PyMBart50Tokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1618,6 +2149,7 @@ impl PyMBart50Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<MBart50Tokenizer, MBart50Vocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1627,6 +2159,7 @@ impl PyMBart50Tokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1635,6 +2168,7 @@ impl PyMBart50Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<MBart50Tokenizer, MBart50Vocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1643,39 +2177,51 @@ impl PyMBart50Tokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<MBart50Tokenizer, MBart50Vocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<MBart50Tokenizer, MBart50Vocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyMBart50Tokenizer, MBart50Tokenizer, MBart50Vocab);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PySentencePieceBpeTokenizer {
     tokenizer: SentencePieceBpeTokenizer,
@@ -1713,6 +2259,7 @@ impl PySentencePieceBpeTokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1720,6 +2267,7 @@ impl PySentencePieceBpeTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<SentencePieceBpeTokenizer, SentencePieceVocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1729,6 +2277,7 @@ impl PySentencePieceBpeTokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1737,6 +2286,7 @@ impl PySentencePieceBpeTokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<SentencePieceBpeTokenizer, SentencePieceVocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1745,39 +2295,54 @@ impl PySentencePieceBpeTokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<SentencePieceBpeTokenizer, SentencePieceVocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<SentencePieceBpeTokenizer, SentencePieceVocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
-            stride,
+            stride, num_threads,
         )
     }
 }
 
+padded_pymethods!(
+    PySentencePieceBpeTokenizer,
+    SentencePieceBpeTokenizer,
+    SentencePieceVocab,
+);
+
 #[pyclass(module = "rust_tokenizers")]
 struct PyM2M100Tokenizer {
     tokenizer: M2M100Tokenizer,
@@ -1817,6 +2382,7 @@ impl PyM2M100Tokenizer {
 
     fn encode(
         &self,
+        py: Python,
         text: &str,
         max_len: usize,
         truncation_strategy: &str,
@@ -1824,6 +2390,7 @@ impl PyM2M100Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<M2M100Tokenizer, M2M100Vocab>>::encode(
             &self,
+            py,
             text,
             max_len,
             truncation_strategy,
@@ -1833,6 +2400,7 @@ impl PyM2M100Tokenizer {
 
     fn encode_pair(
         &self,
+        py: Python,
         text_a: &str,
         text_b: &str,
         max_len: usize,
@@ -1841,6 +2409,7 @@ impl PyM2M100Tokenizer {
     ) -> PyResult<PyTokenizedInput> {
         <Self as PyTokenizer<M2M100Tokenizer, M2M100Vocab>>::encode_pair(
             &self,
+            py,
             text_a,
             text_b,
             max_len,
@@ -1849,39 +2418,51 @@ impl PyM2M100Tokenizer {
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_list(
         &self,
+        py: Python,
         text_list: Vec<&str>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<M2M100Tokenizer, M2M100Vocab>>::encode_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 
+    #[args(num_threads = "None")]
     fn encode_pair_list(
         &self,
+        py: Python,
         text_list: Vec<(&str, &str)>,
         max_len: usize,
         truncation_strategy: &str,
         stride: usize,
+        num_threads: Option<usize>,
     ) -> PyResult<Vec<PyTokenizedInput>> {
         <Self as PyMultiThreadTokenizer<M2M100Tokenizer, M2M100Vocab>>::encode_pair_list(
             &self,
+            py,
             text_list,
             max_len,
             truncation_strategy,
             stride,
+            num_threads,
         )
     }
 }
 
+padded_pymethods!(PyM2M100Tokenizer, M2M100Tokenizer, M2M100Vocab);
+
 #[pymodule]
 fn rust_tokenizers(_py: Python<'_>, m: &PyModule) -> PyResult<()> {
     m.add_class::<PyBertTokenizer>()?;
@@ -0,0 +1,130 @@
+# Copyright 2019 Guillaume Becquin
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from rust_tokenizers import PyAlbertTokenizer, PyBertTokenizer, PySentencePieceTokenizer
+from utils import cached_download, cached_glue_task, cached_pretrained_file, read_tsv_columns
+
+SST2_URL = 'https://dl.fbaipublicfiles.com/glue/data/SST-2.zip'
+XLNET_SPIECE_URL = 'https://s3.amazonaws.com/models.huggingface.co/bert/xlnet-base-cased-spiece.model'
+M2M100_SPIECE_BPE_URL = 'https://huggingface.co/facebook/m2m100_418M/resolve/main/sentencepiece.bpe.model'
+
+
+def pytest_configure(config):
+    # pytest-xdist workers share the cores: each one sizes the Rust (rayon) thread pool and disables the
+    # transformers fast tokenizer threads so that `pytest -n auto` does not oversubscribe the machine
+    worker_count = int(os.environ.get('PYTEST_XDIST_WORKER_COUNT', 1))
+    if worker_count > 1:
+        os.environ.setdefault('RAYON_NUM_THREADS', str(max(os.cpu_count() // worker_count, 1)))
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+
+@pytest.fixture(scope="session")
+def sst2_suite_downloads():
+    # Fetches the files of the SST-2 suite concurrently on a cold cache, the fixtures reading them then hit the disk
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(cached_glue_task, SST2_URL, 'SST-2'),
+                   pool.submit(cached_download, XLNET_SPIECE_URL, 'spiece.model'),
+                   pool.submit(cached_download, M2M100_SPIECE_BPE_URL, 'spiece.bpe.model')]
+        for future in futures:
+            future.result()
+
+
+@pytest.fixture(scope="session")
+def sst2_texts():
+    # Only the sentences are read, SST-2 has no second sentence and the labels are never compared
+    return [sentence for sentence, in read_tsv_columns(cached_glue_task(SST2_URL, 'SST-2') / 'train.tsv', 'sentence')]
+
+
+@pytest.fixture(scope="session")
+def sst2_stripped_texts(sst2_texts):
+    return list(map(str.strip, sst2_texts))
+
+
+@pytest.fixture(scope="session")
+def qnli_pairs():
+    # A local copy of the task directory can be used in place of the download
+    if 'QNLI_PATH' in os.environ:
+        task_dir = Path(os.environ['QNLI_PATH'])
+    else:
+        task_dir = cached_glue_task('https://dl.fbaipublicfiles.com/glue/data/QNLIv2.zip', 'QNLI')
+    return read_tsv_columns(task_dir / 'train.tsv', 'question', 'sentence')
+
+
+@pytest.fixture(scope="session")
+def qnli_unique_pairs(qnli_pairs):
+    # Tokenization is deterministic, so a repeated pair adds no coverage
+    return list(dict.fromkeys(qnli_pairs))
+
+
+@pytest.fixture(scope="session")
+def qnli_unique_questions(qnli_pairs):
+    # Questions repeat across the passages they are paired with
+    return list(dict.fromkeys(question for question, _ in qnli_pairs))
+
+
+@pytest.fixture(scope="session")
+def thread_pool():
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        yield pool
+
+
+@pytest.fixture(scope="session")
+def xlnet_spiece_path():
+    return str(cached_download(XLNET_SPIECE_URL, 'spiece.model'))
+
+
+@pytest.fixture(scope="session")
+def rust_xlnet_sentence_piece_tokenizer(xlnet_spiece_path):
+    return PySentencePieceTokenizer(xlnet_spiece_path, do_lower_case=False)
+
+
+@pytest.fixture(scope="session")
+def m2m100_spiece_bpe_path():
+    return str(cached_download(M2M100_SPIECE_BPE_URL, 'spiece.bpe.model'))
+
+
+@pytest.fixture(scope="session")
+def albert_spiece_path():
+    sentence_piece_url = 'https://s3.amazonaws.com/models.huggingface.co/bert/albert-base-v2-spiece.model'
+    return str(cached_download(sentence_piece_url, 'albert-base-v2-spiece.model'))
+
+
+@pytest.fixture(scope="session")
+def py_albert_tokenizer(albert_spiece_path):
+    import sentencepiece
+    tokenizer = sentencepiece.SentencePieceProcessor()
+    tokenizer.Load(albert_spiece_path)
+    return tokenizer
+
+
+@pytest.fixture(scope="session")
+def rust_albert_tokenizer(albert_spiece_path):
+    return PyAlbertTokenizer(albert_spiece_path, do_lower_case=False, strip_accents=False)
+
+
+@pytest.fixture(scope="session")
+def rust_bert_tokenizer():
+    from transformers import BertTokenizer
+    vocab_path = cached_pretrained_file(BertTokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased'])
+    return PyBertTokenizer(vocab_path, do_lower_case=True, strip_accents=True)
+
+
+@pytest.fixture(scope="session")
+def rust_distilbert_tokenizer():
+    from transformers import DistilBertTokenizer
+    vocab_path = cached_pretrained_file(
+        DistilBertTokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-cased'])
+    return PyBertTokenizer(vocab_path, do_lower_case=False, strip_accents=False)
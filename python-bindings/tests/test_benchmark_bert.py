@@ -10,137 +10,177 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import math
-import tempfile
-from pathlib import Path
+import os
 import gc
-from transformers.file_utils import get_from_cache
-from transformers import BertTokenizer
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from transformers import BertTokenizerFast
 from rust_tokenizers import PyBertTokenizer
 from transformers import BertForSequenceClassification
 import torch
-from timeit import default_timer as timer
+from utils import CACHE_ROOT, DEEP_LEARNING_SENTENCES, cached_pretrained_file, to_padded_tensor
+
+
+PIPELINE_BATCH_SIZE = 8
 
 
 class TestBenchmarkBert:
     def setup_class(self):
         self.use_gpu = torch.cuda.is_available()
-        self.test_dir = Path(tempfile.mkdtemp())
+        self.test_dir = CACHE_ROOT
 
-        self.base_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased', do_lower_case=True,
-                                                            cache_dir=self.test_dir)
+        self.base_tokenizer = BertTokenizerFast.from_pretrained('bert-base-uncased', do_lower_case=True,
+                                                                cache_dir=self.test_dir)
         self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased']),
+            cached_pretrained_file(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased']),
             do_lower_case=True,
             strip_accents=True)
         self.model = BertForSequenceClassification.from_pretrained('bert-base-uncased', output_attentions=False).eval()
         if self.use_gpu:
             self.model.cuda()
-        self.sentence_list = ['For instance, on the planet Earth, man had always assumed that he was more intelligent '
-                              'than dolphins because he had achieved so much—the wheel, New York, wars and so on—whilst'
-                              ' all the dolphins had ever done was muck about in the water having a good time. But '
-                              'conversely, the dolphins had always believed that they were far more intelligent than '
-                              'man—for precisely the same reasons.'] * 64
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        self.sentence_list = DEEP_LEARNING_SENTENCES
+
+        # No sentence needs truncation: the Rust paths can run without a truncation strategy
+        assert all(encoding.num_truncated_tokens == 0
+                   for encoding in self.rust_tokenizer.encode_list(self.sentence_list,
+                                                                   max_len=128,
+                                                                   truncation_strategy='longest_first',
+                                                                   stride=0))
 
         # Pre-allocate GPU memory
-        tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
-        features = [self.base_tokenizer.convert_tokens_to_ids(tokens) for tokens in tokens_list]
-        features = [self.base_tokenizer.prepare_for_model(input, None, add_special_tokens=True, max_length=128) for
-                    input
-                    in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        inputs = self.baseline_inputs()
 
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
+            # Persistent pinned host and device buffers: every batch has the same shape
+            self.pinned_inputs = {name: torch.empty_like(tensor).pin_memory() for name, tensor in inputs.items()}
+            self.gpu_inputs = {name: torch.empty_like(tensor, device='cuda') for name, tensor in inputs.items()}
+            inputs = self.copy_to_gpu(inputs)
 
-        with torch.no_grad():
-            _ = self.model(all_input_ids)[0].cpu().numpy()
+        with torch.inference_mode():
+            _ = self.model(**inputs)[0]
 
-    def setup_base_tokenizer(self):
-        self.base_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased', do_lower_case=True,
-                                                            cache_dir=self.test_dir)
+    def copy_to_gpu(self, inputs):
+        for name, tensor in inputs.items():
+            self.pinned_inputs[name].copy_(tensor)
+        return {name: self.gpu_inputs[name].copy_(self.pinned_inputs[name], non_blocking=True) for name in inputs}
 
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased']),
-            do_lower_case=True,
-            strip_accents=True)
+    def baseline_inputs(self):
+        encodings = self.base_tokenizer(self.sentence_list, truncation=True, max_length=128)
+        return {name: to_padded_tensor(encodings[name]) for name in self.base_tokenizer.model_input_names}
+
+    def rust_inputs(self, encodings, pinned_buffers=True):
+        input_ids, attention_mask, token_type_ids = map(torch.from_numpy, encodings)
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+        if not self.use_gpu:
+            # Only the segment embedding lookup needs int64 indices, the int8 attention mask is used as is
+            inputs['token_type_ids'] = token_type_ids.long()
+            return inputs
+        if pinned_buffers:
+            # The int8 masks are widened by the copy into the int64 pinned buffers
+            return self.copy_to_gpu(inputs)
+        # Pipeline batches vary in shape: each one is staged in pinned memory and copied without blocking, so that the
+        # copy does not wait on the forward pass in flight. The segment ids are widened on the device.
+        inputs = {name: tensor.pin_memory().cuda(non_blocking=True) for name, tensor in inputs.items()}
+        inputs['token_type_ids'] = inputs['token_type_ids'].long()
+        return inputs
+
+    def setup_base_tokenizer(self):
+        self.base_tokenizer = BertTokenizerFast.from_pretrained('bert-base-uncased', do_lower_case=True,
+                                                                cache_dir=self.test_dir)
 
     def baseline_batch(self):
-        tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
-        features = [self.base_tokenizer.convert_tokens_to_ids(tokens) for tokens in tokens_list]
-        features = [self.base_tokenizer.prepare_for_model(input,
-                                                          None,
-                                                          add_special_tokens=True,
-                                                          max_length=128) for input in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        inputs = self.baseline_inputs()
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            inputs = self.copy_to_gpu(inputs)
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
+        if self.use_gpu:
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
     def rust_batch_single_threaded(self):
-        features = [self.rust_tokenizer.encode(sentence,
-                                               max_len=128,
-                                               truncation_strategy='longest_first',
-                                               stride=0) for sentence in self.sentence_list]
-        all_input_ids = torch.tensor([f.token_ids for f in features], dtype=torch.long)
+        encode_list_padded_with_masks = functools.partial(self.rust_tokenizer.encode_list_padded_with_masks,
+                                                          max_len=128,
+                                                          truncation_strategy='do_not_truncate',
+                                                          stride=0,
+                                                          num_threads=1)
+        inputs = self.rust_inputs(encode_list_padded_with_masks(self.sentence_list))
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
     def rust_batch_multi_threaded(self):
-        features = self.rust_tokenizer.encode_list(self.sentence_list,
-                                                   max_len=128,
-                                                   truncation_strategy='longest_first',
-                                                   stride=0)
-        all_input_ids = torch.tensor([f.token_ids for f in features], dtype=torch.long)
+        encode_list_padded_with_masks = functools.partial(self.rust_tokenizer.encode_list_padded_with_masks,
+                                                          max_len=128,
+                                                          truncation_strategy='do_not_truncate',
+                                                          stride=0,
+                                                          num_threads=min(os.cpu_count(), len(self.sentence_list)))
+        inputs = self.rust_inputs(encode_list_padded_with_masks(self.sentence_list))
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
-    def test_bert_baseline(self):
-        values = []
-        for i in range(10):
-            self.setup_base_tokenizer()
-            t0 = timer()
-            self.baseline_batch()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'baseline - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
-
-    def test_bert_rust_single_threaded(self):
-        values = []
-        for i in range(10):
-            self.setup_rust_tokenizer()
-            t0 = timer()
-            self.rust_batch_single_threaded()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'rust single thread - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
-
-    def test_bert_rust_multi_threaded(self):
-        values = []
-        for i in range(10):
-            self.setup_rust_tokenizer()
-            t0 = timer()
-            self.rust_batch_multi_threaded()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'rust multi threaded - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
+    def prefetched(self, encode, batches):
+        """Yields the encoding of each batch, the next batch being encoded on the prefetch thread while the caller
+        runs the forward pass of the current one. The Rust batch encoding releases the GIL, so the two overlap."""
+        next_encodings = self.prefetch_pool.submit(encode, batches[0])
+        for next_batch in batches[1:]:
+            encodings = next_encodings.result()
+            next_encodings = self.prefetch_pool.submit(encode, next_batch)
+            yield encodings
+        yield next_encodings.result()
+
+    def rust_pipeline(self, prefetch):
+        encode_list_padded_with_masks = functools.partial(self.rust_tokenizer.encode_list_padded_with_masks,
+                                                          max_len=128,
+                                                          truncation_strategy='do_not_truncate',
+                                                          stride=0,
+                                                          num_threads=min(os.cpu_count(), PIPELINE_BATCH_SIZE))
+        batches = [self.sentence_list[start:start + PIPELINE_BATCH_SIZE]
+                   for start in range(0, len(self.sentence_list), PIPELINE_BATCH_SIZE)]
+        if prefetch:
+            batch_encodings = self.prefetched(encode_list_padded_with_masks, batches)
+        else:
+            # The sequential baseline encodes each batch inline, with no hand-off to the prefetch thread
+            batch_encodings = map(encode_list_padded_with_masks, batches)
+        outputs = []
+        for encodings in batch_encodings:
+            inputs = self.rust_inputs(encodings, pinned_buffers=False)
+            with torch.inference_mode():
+                outputs.append(self.model(**inputs)[0])
+        if self.use_gpu:
+            # The outputs are not copied back to the host: wait for the forward passes so that they are timed
+            torch.cuda.synchronize()
+        return outputs
+
+    def test_bert_baseline(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, iterations=1, rounds=10)
+
+    def test_bert_baseline_cold(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, setup=self.setup_base_tokenizer, iterations=1, rounds=10)
+
+    def test_bert_rust_single_threaded(self, benchmark):
+        benchmark.pedantic(self.rust_batch_single_threaded, iterations=1, rounds=10)
+
+    def test_bert_rust_multi_threaded(self, benchmark):
+        benchmark.pedantic(self.rust_batch_multi_threaded, iterations=1, rounds=10)
+
+    def test_bert_rust_pipeline_sequential(self, benchmark):
+        benchmark.pedantic(self.rust_pipeline, args=(False,), iterations=1, rounds=10)
+
+    def test_bert_rust_pipeline_prefetched(self, benchmark):
+        benchmark.pedantic(self.rust_pipeline, args=(True,), iterations=1, rounds=10)
 
     def teardown_class(self):
+        self.prefetch_pool.shutdown()
         self.model = None
         self.base_tokenizer = None
         self.rust_tokenizer = None
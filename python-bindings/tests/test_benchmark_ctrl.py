@@ -9,28 +9,23 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import math
-import tempfile
-from pathlib import Path
 import gc
-from transformers.file_utils import get_from_cache
 from transformers import CTRLTokenizer
 from rust_tokenizers import PyCtrlTokenizer
 from transformers import CTRLModel
 import torch
-from timeit import default_timer as timer
+from utils import CACHE_ROOT, cached_pretrained_file, to_padded_tensor
 
 
 class TestBenchmarkCTRL:
     def setup_class(self):
         self.use_gpu = torch.cuda.is_available()
-        self.test_dir = Path(tempfile.mkdtemp())
+        self.test_dir = CACHE_ROOT
 
-        self.base_tokenizer = CTRLTokenizer.from_pretrained('ctrl', do_lower_case=True,
-                                                            cache_dir=self.test_dir)
+        self.base_tokenizer = CTRLTokenizer.from_pretrained('ctrl', cache_dir=self.test_dir)
         self.rust_tokenizer = PyCtrlTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['ctrl']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['ctrl']),
+            cached_pretrained_file(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['ctrl']),
+            cached_pretrained_file(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['ctrl']),
             do_lower_case=True
         )
         self.model = CTRLModel.from_pretrained('ctrl',
@@ -43,30 +38,37 @@ class TestBenchmarkCTRL:
                               'conversely, the dolphins had always believed that they were far more intelligent than '
                               'man—for precisely the same reasons.'] * 1
 
+        # No sentence needs truncation: the Rust paths can run without a truncation strategy
+        assert all(encoding.num_truncated_tokens == 0
+                   for encoding in self.rust_tokenizer.encode_list(self.sentence_list,
+                                                                   max_len=128,
+                                                                   truncation_strategy='longest_first',
+                                                                   stride=0))
+
         # Pre-allocate GPU memory
         tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
         features = [self.base_tokenizer.convert_tokens_to_ids(tokens) for tokens in tokens_list]
         features = [self.base_tokenizer.prepare_for_model(input, None, add_special_tokens=True, max_length=128) for
                     input
                     in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        all_input_ids = to_padded_tensor([f['input_ids'] for f in features])
 
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
+            # Persistent pinned host and device buffers: every batch has the same shape
+            self.pinned_input_ids = torch.empty_like(all_input_ids).pin_memory()
+            self.gpu_input_ids = torch.empty_like(all_input_ids, device='cuda')
+            self.pinned_input_ids.copy_(all_input_ids)
+            all_input_ids = self.gpu_input_ids.copy_(self.pinned_input_ids, non_blocking=True)
 
-        with torch.no_grad():
-            _ = self.model(all_input_ids)[0].cpu().numpy()
+        with torch.inference_mode():
+            _ = self.model(all_input_ids)[0]
 
-    def setup_base_tokenizer(self):
-        self.base_tokenizer = CTRLTokenizer.from_pretrained('ctrl', do_lower_case=True,
-                                                            cache_dir=self.test_dir)
+    def copy_to_gpu(self, input_ids):
+        self.pinned_input_ids.copy_(input_ids)
+        return self.gpu_input_ids.copy_(self.pinned_input_ids, non_blocking=True)
 
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PyCtrlTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['ctrl']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['ctrl']),
-            do_lower_case=True
-        )
+    def setup_base_tokenizer(self):
+        self.base_tokenizer = CTRLTokenizer.from_pretrained('ctrl', cache_dir=self.test_dir)
 
     def baseline_batch(self):
         tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
@@ -75,48 +77,40 @@ class TestBenchmarkCTRL:
                                                           None,
                                                           add_special_tokens=True,
                                                           max_length=128) for input in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        all_input_ids = to_padded_tensor([f['input_ids'] for f in features])
+        if self.use_gpu:
+            all_input_ids = self.copy_to_gpu(all_input_ids)
+        with torch.inference_mode():
+            output = self.model(all_input_ids)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
     def rust_batch_single_threaded(self):
-        features = [self.rust_tokenizer.encode(sentence,
-                                               max_len=128,
-                                               truncation_strategy='longest_first',
-                                               stride=0) for sentence in self.sentence_list]
-        all_input_ids = torch.tensor([f.token_ids for f in features], dtype=torch.long)
+        input_ids = self.rust_tokenizer.encode_list_padded(self.sentence_list,
+                                                           max_len=128,
+                                                           truncation_strategy='do_not_truncate',
+                                                           stride=0,
+                                                           num_threads=1)
+        all_input_ids = torch.from_numpy(input_ids)
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            all_input_ids = self.copy_to_gpu(all_input_ids)
+        with torch.inference_mode():
+            output = self.model(all_input_ids)[0]
+        if self.use_gpu:
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
-    def test_ctrl_baseline(self):
-        values = []
-        for i in range(10):
-            self.setup_base_tokenizer()
-            t0 = timer()
-            self.baseline_batch()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'baseline - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
+    def test_ctrl_baseline(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, iterations=1, rounds=10)
+
+    def test_ctrl_baseline_cold(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, setup=self.setup_base_tokenizer, iterations=1, rounds=10)
 
-    def test_ctrl_rust_single_threaded(self):
-        values = []
-        for i in range(10):
-            self.setup_rust_tokenizer()
-            t0 = timer()
-            self.rust_batch_single_threaded()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'rust single thread - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
+    def test_ctrl_rust_single_threaded(self, benchmark):
+        benchmark.pedantic(self.rust_batch_single_threaded, iterations=1, rounds=10)
 
     def teardown_class(self):
         self.model = None
@@ -9,137 +9,149 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import math
-import tempfile
-from pathlib import Path
+import os
 import gc
-from transformers.file_utils import get_from_cache
-from transformers import DistilBertTokenizer
+import functools
+from transformers import DistilBertTokenizerFast
 from rust_tokenizers import PyBertTokenizer
 from transformers import DistilBertForSequenceClassification
 import torch
-from timeit import default_timer as timer
+from utils import CACHE_ROOT, DEEP_LEARNING_SENTENCES, cached_pretrained_file, to_padded_tensor
 
 
 class TestBenchmarkDistilBert:
     def setup_class(self):
         self.use_gpu = torch.cuda.is_available()
-        self.test_dir = Path(tempfile.mkdtemp())
+        self.test_dir = CACHE_ROOT
 
-        self.base_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased', do_lower_case=True,
-                                                                  cache_dir=self.test_dir)
+        self.base_tokenizer = DistilBertTokenizerFast.from_pretrained('distilbert-base-uncased', do_lower_case=True,
+                                                                      cache_dir=self.test_dir)
         self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-uncased']),
+            cached_pretrained_file(
+                self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-uncased']),
             do_lower_case=True,
             strip_accents=True)
         self.model = DistilBertForSequenceClassification.from_pretrained('distilbert-base-uncased',
                                                                          output_attentions=False).eval()
         if self.use_gpu:
             self.model.cuda()
-        self.sentence_list = ['For instance, on the planet Earth, man had always assumed that he was more intelligent '
-                              'than dolphins because he had achieved so much—the wheel, New York, wars and so on—whilst'
-                              ' all the dolphins had ever done was muck about in the water having a good time. But '
-                              'conversely, the dolphins had always believed that they were far more intelligent than '
-                              'man—for precisely the same reasons.'] * 64
+        self.sentence_list = DEEP_LEARNING_SENTENCES
+
+        # No sentence needs truncation: the Rust paths can run without a truncation strategy
+        assert all(encoding.num_truncated_tokens == 0
+                   for encoding in self.rust_tokenizer.encode_list(self.sentence_list,
+                                                                   max_len=128,
+                                                                   truncation_strategy='longest_first',
+                                                                   stride=0))
 
         # Pre-allocate GPU memory
-        tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
-        features = [self.base_tokenizer.convert_tokens_to_ids(tokens) for tokens in tokens_list]
-        features = [self.base_tokenizer.prepare_for_model(input, None, add_special_tokens=True, max_length=128) for
-                    input
-                    in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        inputs = self.baseline_inputs()
 
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
+            # Persistent pinned host and device buffers: every batch has the same shape
+            self.pinned_inputs = {name: torch.empty_like(tensor).pin_memory() for name, tensor in inputs.items()}
+            self.gpu_inputs = {name: torch.empty_like(tensor, device='cuda') for name, tensor in inputs.items()}
+            inputs = self.copy_to_gpu(inputs)
 
-        with torch.no_grad():
-            _ = self.model(all_input_ids)[0].cpu().numpy()
+        with torch.inference_mode():
+            _ = self.model(**inputs)[0]
 
-    def setup_base_tokenizer(self):
-        self.base_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased', do_lower_case=True,
-                                                                  cache_dir=self.test_dir)
+    def copy_to_gpu(self, inputs):
+        for name, tensor in inputs.items():
+            self.pinned_inputs[name].copy_(tensor)
+        return {name: self.gpu_inputs[name].copy_(self.pinned_inputs[name], non_blocking=True) for name in inputs}
 
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-uncased']),
-            do_lower_case=True,
-            strip_accents=True
-        )
+    def baseline_inputs(self):
+        encodings = self.base_tokenizer(self.sentence_list, truncation=True, max_length=128)
+        return {name: to_padded_tensor(encodings[name]) for name in self.base_tokenizer.model_input_names}
+
+    def rust_inputs(self, encodings):
+        # DistilBERT takes no segment ids
+        input_ids, attention_mask, _ = map(torch.from_numpy, encodings)
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if self.use_gpu:
+            # The int8 attention mask is widened by the copy into the int64 pinned buffer
+            return self.copy_to_gpu(inputs)
+        # The int8 attention mask is used as is
+        return inputs
+
+    def setup_base_tokenizer(self):
+        self.base_tokenizer = DistilBertTokenizerFast.from_pretrained('distilbert-base-uncased', do_lower_case=True,
+                                                                      cache_dir=self.test_dir)
 
     def baseline_batch(self):
-        tokens_list = [self.base_tokenizer.tokenize(sentence) for sentence in self.sentence_list]
-        features = [self.base_tokenizer.convert_tokens_to_ids(tokens) for tokens in tokens_list]
-        features = [self.base_tokenizer.prepare_for_model(input,
-                                                          None,
-                                                          add_special_tokens=True,
-                                                          max_length=128) for input in features]
-        all_input_ids = torch.tensor([f['input_ids'] for f in features], dtype=torch.long)
+        inputs = self.baseline_inputs()
+        if self.use_gpu:
+            inputs = self.copy_to_gpu(inputs)
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
+        return output
+
+    def encode_sentence(self, sentence):
+        return self.base_tokenizer(sentence, truncation=True, max_length=128)
+
+    def baseline_batch_cached(self, encode_sentence):
+        encodings = [encode_sentence(sentence) for sentence in self.sentence_list]
+        inputs = {name: to_padded_tensor([encoding[name] for encoding in encodings])
+                  for name in self.base_tokenizer.model_input_names}
+        if self.use_gpu:
+            inputs = self.copy_to_gpu(inputs)
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
+        if self.use_gpu:
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
     def rust_batch_single_threaded(self):
-        features = [self.rust_tokenizer.encode(sentence,
-                                               max_len=128,
-                                               truncation_strategy='longest_first',
-                                               stride=0) for sentence in self.sentence_list]
-        all_input_ids = torch.tensor([f.token_ids for f in features], dtype=torch.long)
+        encode_list_padded_with_masks = functools.partial(self.rust_tokenizer.encode_list_padded_with_masks,
+                                                          max_len=128,
+                                                          truncation_strategy='do_not_truncate',
+                                                          stride=0,
+                                                          num_threads=1)
+        inputs = self.rust_inputs(encode_list_padded_with_masks(self.sentence_list))
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
     def rust_batch_multi_threaded(self):
-        features = self.rust_tokenizer.encode_list(self.sentence_list,
-                                                   max_len=128,
-                                                   truncation_strategy='longest_first',
-                                                   stride=0)
-        all_input_ids = torch.tensor([f.token_ids for f in features], dtype=torch.long)
+        encode_list_padded_with_masks = functools.partial(self.rust_tokenizer.encode_list_padded_with_masks,
+                                                          max_len=128,
+                                                          truncation_strategy='do_not_truncate',
+                                                          stride=0,
+                                                          num_threads=min(os.cpu_count(), len(self.sentence_list)))
+        inputs = self.rust_inputs(encode_list_padded_with_masks(self.sentence_list))
+        with torch.inference_mode():
+            output = self.model(**inputs)[0]
         if self.use_gpu:
-            all_input_ids = all_input_ids.cuda()
-        with torch.no_grad():
-            output = self.model(all_input_ids)[0].cpu().numpy()
+            # The output is not copied back to the host: wait for the forward pass so that it is timed
+            torch.cuda.synchronize()
         return output
 
-    def test_distilbert_baseline(self):
-        values = []
-        for i in range(10):
-            self.setup_base_tokenizer()
-            t0 = timer()
-            self.baseline_batch()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'baseline - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
-
-    def test_distilbert_rust_single_threaded(self):
-        values = []
-        for i in range(10):
-            self.setup_rust_tokenizer()
-            t0 = timer()
-            self.rust_batch_single_threaded()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'rust single thread - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
-
-    def test_distilbert_rust_multi_threaded(self):
-        values = []
-        for i in range(10):
-            self.setup_rust_tokenizer()
-            t0 = timer()
-            self.rust_batch_multi_threaded()
-            t1 = timer()
-            values.append((t1 - t0) * 1000)
-        mean = sum(values) / len(values)
-        std_dev = math.sqrt(sum([(value - mean) ** 2 for value in values])) / (len(values) - 1)
-        print(f'rust multi threaded - mean: {mean:.2f}, std. dev: {std_dev:.2f}')
+    def test_distilbert_baseline(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, iterations=1, rounds=10)
+
+    def test_distilbert_baseline_cold(self, benchmark):
+        benchmark.pedantic(self.baseline_batch, setup=self.setup_base_tokenizer, iterations=1, rounds=10)
+
+    def test_distilbert_baseline_cached(self, benchmark):
+        # The baseline encodings are memoized per sentence and the warm-up round fills the cache: the timed rounds
+        # measure a fully cached tokenization
+        encode_sentence = functools.lru_cache(maxsize=None)(self.encode_sentence)
+        benchmark.pedantic(self.baseline_batch_cached, args=(encode_sentence,), warmup_rounds=1, iterations=1,
+                           rounds=10)
+
+    def test_distilbert_rust_single_threaded(self, benchmark):
+        benchmark.pedantic(self.rust_batch_single_threaded, iterations=1, rounds=10)
+
+    def test_distilbert_rust_multi_threaded(self, benchmark):
+        benchmark.pedantic(self.rust_batch_multi_threaded, iterations=1, rounds=10)
 
     def teardown_class(self):
         self.model = None
@@ -11,97 +11,116 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tempfile
-from pathlib import Path
-from zipfile import ZipFile
+import functools
+import os
 
-import requests
-import sentencepiece
-from rust_tokenizers.rust_tokenizers import PyAlbertTokenizer
-from transformers.data.processors.glue import Sst2Processor
-from transformers import AlbertTokenizer
+import pytest
+from rust_tokenizers import PyAlbertTokenizer
+from utils import encode_deduplicated, encode_list_sharded, unique_ratio
+
+THREADS_PER_TOKENIZER = 4
+NUM_SHARDS = max(1, os.cpu_count() // THREADS_PER_TOKENIZER)
+
+
+@pytest.fixture(scope="module")
+def rust_albert_shards(albert_spiece_path):
+    return [PyAlbertTokenizer(albert_spiece_path, do_lower_case=False, strip_accents=False)
+            for _ in range(NUM_SHARDS)]
 
 
 class TestBenchmarkAlbert:
-    def setup_class(self):
-        self.processor = Sst2Processor()
-        self.test_dir = Path(tempfile.mkdtemp())
-        sst2_url = 'https://firebasestorage.googleapis.com/v0/b/mtl-sentence-representations.appspot.com/o/data%2FSST-2.zip?alt=media&token=aabc5f6b-e466-44a2-b9b4-cf6337f84ac8'
-        contents = requests.get(sst2_url)
-        (self.test_dir / 'SST-2.zip').open('wb').write(contents.content)
-        with ZipFile(self.test_dir / 'SST-2.zip', 'r') as zipObj:
-            zipObj.extractall(self.test_dir)
-        self.examples = self.processor.get_train_examples(self.test_dir / 'SST-2')
-        sentence_piece_url = 'https://s3.amazonaws.com/models.huggingface.co/bert/albert-base-v2-spiece.model'
-        contents = requests.get(sentence_piece_url)
-        (self.test_dir / 'albert-base-v2-spiece.model').open('wb').write(contents.content)
-        self.base_tokenizer = AlbertTokenizer.from_pretrained(str(self.test_dir / 'albert-base-v2-spiece.model'))
-        self.rust_tokenizer = PyAlbertTokenizer(str(self.test_dir / 'albert-base-v2-spiece.model'),
-                                                do_lower_case=True,
-                                                strip_accents=True)
-
-    def setup_python_tokenizer(self):
-        self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'albert-base-v2-spiece.model'))
-
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PyAlbertTokenizer(str(self.test_dir / 'albert-base-v2-spiece.model'),
-                                                do_lower_case=False,
-                                                strip_accents=False)
-
-    def python_albert_tokenizer(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.EncodeAsIds(example.text_a))
-
-    def rust_albert_tokenizer_single_threaded(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.rust_tokenizer.encode(example.text_a,
-                                                              max_len=128,
-                                                              truncation_strategy='longest_first',
-                                                              stride=0))
-
-    def rust_albert_tokenizer_multi_threaded(self):
-        self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
+    def python_albert_tokenizer(self, texts, tokenizer):
+        encode_deduplicated(functools.partial(tokenizer.encode, out_type=int), texts)
+
+    def rust_albert_tokenizer_single_threaded(self, texts, tokenizer):
+        encode = tokenizer.encode
+
+        def encode_list(unique_texts):
+            output = [None] * len(unique_texts)
+            for idx, text in enumerate(unique_texts):
+                output[idx] = encode(text, max_len=128, truncation_strategy='longest_first', stride=0)
+            return output
+
+        encode_deduplicated(encode_list, texts)
+
+    def rust_albert_tokenizer_multi_threaded(self, texts, tokenizer):
+        encode_list = functools.partial(tokenizer.encode_list,
+                                        max_len=128,
+                                        truncation_strategy='longest_first',
+                                        stride=0)
+        encode_deduplicated(encode_list, texts)
+
+    def rust_albert_tokenizer_thread_pool(self, texts, tokenizer, thread_pool):
+        encode = functools.partial(tokenizer.encode, max_len=128, truncation_strategy='longest_first', stride=0)
+        encode_deduplicated(lambda unique_texts: list(thread_pool.map(encode, unique_texts)), texts)
+
+    def rust_albert_tokenizer_sharded(self, texts, shards, thread_pool):
+        encode_list = functools.partial(encode_list_sharded, shards,
+                                        thread_pool=thread_pool,
+                                        num_threads=THREADS_PER_TOKENIZER,
                                         max_len=128,
                                         truncation_strategy='longest_first',
                                         stride=0)
+        # The shards take contiguous chunks: the distinct texts keep their order so that the chunks stay balanced
+        encode_deduplicated(encode_list, texts, longest_first=False)
+
+    def rust_albert_encoding_single_threaded(self, texts, tokenizer):
+        encode = tokenizer.encode
 
-    def rust_albert_encoding_single_threaded(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.rust_tokenizer.encode(example.text_a,
-                                                              max_len=128,
-                                                              truncation_strategy='longest_first',
-                                                              stride=0))
+        def encode_list(unique_texts):
+            output = [None] * len(unique_texts)
+            for idx, text in enumerate(unique_texts):
+                output[idx] = encode(text, max_len=128, truncation_strategy='longest_first', stride=0)
+            return output
 
-    def rust_albert_encoding_multi_threaded(self):
-        self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
+        encode_deduplicated(encode_list, texts)
+
+    def rust_albert_encoding_multi_threaded(self, texts, tokenizer):
+        encode_list = functools.partial(tokenizer.encode_list,
                                         max_len=128,
                                         truncation_strategy='longest_first',
                                         stride=0)
+        encode_deduplicated(encode_list, texts)
+
+    def test_python_albert_tokenizer_single_threaded(self, benchmark, sst2_texts, py_albert_tokenizer):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.python_albert_tokenizer, args=(sst2_texts, py_albert_tokenizer), iterations=1,
+                           rounds=3)
 
-    def test_python_albert_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.python_albert_tokenizer, setup=self.setup_python_tokenizer, iterations=1,
+    def test_rust_albert_tokenizer_single_threaded(self, benchmark, sst2_texts, rust_albert_tokenizer):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_tokenizer_single_threaded, args=(sst2_texts, rust_albert_tokenizer),
+                           iterations=1,
+                           rounds=3)
+
+    def test_rust_albert_tokenizer_multi_threaded(self, benchmark, sst2_texts, rust_albert_tokenizer):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_tokenizer_multi_threaded, args=(sst2_texts, rust_albert_tokenizer),
+                           iterations=1,
                            rounds=3)
 
-    def test_rust_albert_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_albert_tokenizer_single_threaded, setup=self.setup_rust_tokenizer,
+    def test_rust_albert_tokenizer_thread_pool(self, benchmark, sst2_texts, rust_albert_tokenizer, thread_pool):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_tokenizer_thread_pool,
+                           args=(sst2_texts, rust_albert_tokenizer, thread_pool),
                            iterations=1,
                            rounds=3)
 
-    def test_rust_albert_tokenizer_multi_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_albert_tokenizer_multi_threaded, setup=self.setup_rust_tokenizer,
+    def test_rust_albert_tokenizer_sharded(self, benchmark, sst2_texts, rust_albert_shards, thread_pool):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_tokenizer_sharded,
+                           args=(sst2_texts, rust_albert_shards, thread_pool),
                            iterations=1,
                            rounds=3)
 
-    def test_rust_albert_encoding_single_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_albert_encoding_single_threaded, setup=self.setup_rust_tokenizer,
+    def test_rust_albert_encoding_single_threaded(self, benchmark, sst2_texts, rust_albert_tokenizer):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_encoding_single_threaded, args=(sst2_texts, rust_albert_tokenizer),
                            iterations=1,
                            rounds=3)
 
-    def test_rust_albert_encoding_multi_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_albert_encoding_multi_threaded, setup=self.setup_rust_tokenizer,
+    def test_rust_albert_encoding_multi_threaded(self, benchmark, sst2_texts, rust_albert_tokenizer):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(sst2_texts)
+        benchmark.pedantic(self.rust_albert_encoding_multi_threaded, args=(sst2_texts, rust_albert_tokenizer),
                            iterations=1,
                            rounds=3)
@@ -11,78 +11,77 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tempfile
-from pathlib import Path
-from zipfile import ZipFile
-
-import requests
-from transformers.data.processors.glue import Sst2Processor
-from transformers.file_utils import get_from_cache
-from transformers import RobertaTokenizer
+import functools
+import pytest
 from rust_tokenizers import PyRobertaTokenizer
+from utils import CACHE_ROOT, cached_pretrained_file, encode_deduplicated, unique_ratio
 
 
 class TestBenchmarkRoberta:
+    @pytest.fixture(autouse=True)
+    def load_examples(self, sst2_texts, thread_pool):
+        self.texts = sst2_texts
+        self.thread_pool = thread_pool
+
     def setup_class(self):
-        self.processor = Sst2Processor()
-        self.test_dir = Path(tempfile.mkdtemp())
-        sst2_url = 'https://firebasestorage.googleapis.com/v0/b/mtl-sentence-representations.appspot.com/o/data%2FSST-2.zip?alt=media&token=aabc5f6b-e466-44a2-b9b4-cf6337f84ac8'
-        contents = requests.get(sst2_url)
-        (self.test_dir / 'SST-2.zip').open('wb').write(contents.content)
-        with ZipFile(self.test_dir / 'SST-2.zip', 'r') as zipObj:
-            zipObj.extractall(self.test_dir)
-        self.examples = self.processor.get_train_examples(self.test_dir / 'SST-2')
+        from transformers import RobertaTokenizer
+        self.test_dir = CACHE_ROOT
         self.base_tokenizer = RobertaTokenizer.from_pretrained('roberta-base',
-                                                               do_lower_case=False,
                                                                cache_dir=self.test_dir)
         self.rust_tokenizer = PyRobertaTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['roberta-base']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['roberta-base']),
-            do_lower_case=False,
-            add_prefix_space=True)
-
-    def setup_python_tokenizer(self):
-        self.base_tokenizer = RobertaTokenizer.from_pretrained('roberta-base',
-                                                               do_lower_case=False,
-                                                               cache_dir=self.test_dir)
-
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PyRobertaTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['roberta-base']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['roberta-base']),
+            cached_pretrained_file(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['roberta-base']),
+            cached_pretrained_file(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['roberta-base']),
             do_lower_case=False,
             add_prefix_space=False)
 
     def python_roberta_tokenizer(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+        def encode_list(texts):
+            return self.base_tokenizer(texts,
+                                       add_special_tokens=True,
+                                       return_overflowing_tokens=True,
+                                       return_special_tokens_mask=True,
+                                       max_length=128,
+                                       truncation=True)['input_ids']
+
+        encode_deduplicated(encode_list, self.texts)
 
     def rust_roberta_tokenizer_single_threaded(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.rust_tokenizer.encode(example.text_a,
-                                                              max_len=128,
-                                                              truncation_strategy='longest_first',
-                                                              stride=0))
+        encode = self.rust_tokenizer.encode
+
+        def encode_list(unique_texts):
+            output = [None] * len(unique_texts)
+            for idx, text in enumerate(unique_texts):
+                output[idx] = encode(text, max_len=128, truncation_strategy='longest_first', stride=0)
+            return output
+
+        encode_deduplicated(encode_list, self.texts)
 
     def rust_roberta_tokenizer_multi_threaded(self):
-        self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
+        encode_list = functools.partial(self.rust_tokenizer.encode_list,
                                         max_len=128,
                                         truncation_strategy='longest_first',
                                         stride=0)
+        encode_deduplicated(encode_list, self.texts)
+
+    def rust_roberta_tokenizer_thread_pool(self):
+        encode = functools.partial(self.rust_tokenizer.encode,
+                                   max_len=128,
+                                   truncation_strategy='longest_first',
+                                   stride=0)
+        encode_deduplicated(lambda unique_texts: list(self.thread_pool.map(encode, unique_texts)), self.texts)
 
     def test_python_roberta_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.python_roberta_tokenizer, setup=self.setup_python_tokenizer, iterations=1, rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.python_roberta_tokenizer, iterations=1, rounds=3)
 
     def test_rust_roberta_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_roberta_tokenizer_single_threaded, setup=self.setup_rust_tokenizer, iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_roberta_tokenizer_single_threaded, iterations=1, rounds=3)
 
     def test_rust_roberta_tokenizer_multi_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_roberta_tokenizer_multi_threaded, setup=self.setup_rust_tokenizer, iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_roberta_tokenizer_multi_threaded, iterations=1, rounds=3)
+
+    def test_rust_roberta_tokenizer_thread_pool(self, benchmark):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_roberta_tokenizer_thread_pool, iterations=1, rounds=3)
@@ -11,93 +11,93 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tempfile
-from pathlib import Path
-from zipfile import ZipFile
-
-import requests
-import sentencepiece
+import functools
+import pytest
 from rust_tokenizers.rust_tokenizers import PySentencePieceTokenizer
-from transformers.data.processors.glue import Sst2Processor
+from utils import CACHE_ROOT, cached_download, encode_deduplicated, unique_ratio
 
 
 class TestBenchmarkSentencePiece:
+    @pytest.fixture(autouse=True)
+    def load_examples(self, sst2_texts, thread_pool):
+        self.texts = sst2_texts
+        self.thread_pool = thread_pool
+
     def setup_class(self):
-        self.processor = Sst2Processor()
-        self.test_dir = Path(tempfile.mkdtemp())
-        sst2_url = 'https://firebasestorage.googleapis.com/v0/b/mtl-sentence-representations.appspot.com/o/data%2FSST-2.zip?alt=media&token=aabc5f6b-e466-44a2-b9b4-cf6337f84ac8'
-        contents = requests.get(sst2_url)
-        (self.test_dir / 'SST-2.zip').open('wb').write(contents.content)
-        with ZipFile(self.test_dir / 'SST-2.zip', 'r') as zipObj:
-            zipObj.extractall(self.test_dir)
-        self.examples = self.processor.get_train_examples(self.test_dir / 'SST-2')
+        import sentencepiece
+        self.test_dir = CACHE_ROOT
         sentence_piece_url = 'https://s3.amazonaws.com/models.huggingface.co/bert/xlnet-base-cased-spiece.model'
-        contents = requests.get(sentence_piece_url)
-        (self.test_dir / 'spiece.model').open('wb').write(contents.content)
-        self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'spiece.model'))
-        self.rust_tokenizer = PySentencePieceTokenizer(str(self.test_dir / 'spiece.model'), do_lower_case=False)
-
-    def setup_python_tokenizer(self):
+        self.spiece_model = str(cached_download(sentence_piece_url, 'spiece.model'))
         self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'spiece.model'))
-
-    def setup_rust_tokenizer(self):
-        self.rust_tokenizer = PySentencePieceTokenizer(str(self.test_dir / 'spiece.model'), do_lower_case=False)
+        self.base_tokenizer.Load(self.spiece_model)
+        self.rust_tokenizer = PySentencePieceTokenizer(self.spiece_model, do_lower_case=False)
 
     def python_sentence_piece_tokenizer(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.EncodeAsIds(example.text_a))
+        encode_deduplicated(functools.partial(self.base_tokenizer.encode, out_type=int), self.texts)
 
     def rust_sentence_piece_tokenizer_single_threaded(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.rust_tokenizer.encode(example.text_a,
-                                                              max_len=128,
-                                                              truncation_strategy='longest_first',
-                                                              stride=0))
+        encode = self.rust_tokenizer.encode
+
+        def encode_list(unique_texts):
+            output = [None] * len(unique_texts)
+            for idx, text in enumerate(unique_texts):
+                output[idx] = encode(text, max_len=128, truncation_strategy='longest_first', stride=0)
+            return output
+
+        encode_deduplicated(encode_list, self.texts)
 
     def rust_sentence_piece_tokenizer_multi_threaded(self):
-        self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
+        encode_list = functools.partial(self.rust_tokenizer.encode_list,
                                         max_len=128,
                                         truncation_strategy='longest_first',
                                         stride=0)
+        encode_deduplicated(encode_list, self.texts)
+
+    def rust_sentence_piece_tokenizer_thread_pool(self):
+        encode = functools.partial(self.rust_tokenizer.encode,
+                                   max_len=128,
+                                   truncation_strategy='longest_first',
+                                   stride=0)
+        encode_deduplicated(lambda unique_texts: list(self.thread_pool.map(encode, unique_texts)), self.texts)
 
     def rust_sentence_piece_encoding_single_threaded(self):
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.rust_tokenizer.encode(example.text_a,
-                                                              max_len=128,
-                                                              truncation_strategy='longest_first',
-                                                              stride=0))
+        encode = self.rust_tokenizer.encode
+
+        def encode_list(unique_texts):
+            output = [None] * len(unique_texts)
+            for idx, text in enumerate(unique_texts):
+                output[idx] = encode(text, max_len=128, truncation_strategy='longest_first', stride=0)
+            return output
+
+        encode_deduplicated(encode_list, self.texts)
 
     def rust_sentence_piece_encoding_multi_threaded(self):
-        self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
+        encode_list = functools.partial(self.rust_tokenizer.encode_list,
                                         max_len=128,
                                         truncation_strategy='longest_first',
                                         stride=0)
+        encode_deduplicated(encode_list, self.texts)
 
     def test_python_sentence_piece_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.python_sentence_piece_tokenizer, setup=self.setup_python_tokenizer, iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.python_sentence_piece_tokenizer, iterations=1, rounds=3)
 
     def test_rust_sentence_piece_tokenizer_single_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_sentence_piece_tokenizer_single_threaded, setup=self.setup_rust_tokenizer,
-                           iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_sentence_piece_tokenizer_single_threaded, iterations=1, rounds=3)
 
     def test_rust_sentence_piece_tokenizer_multi_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_sentence_piece_tokenizer_multi_threaded, setup=self.setup_rust_tokenizer,
-                           iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_sentence_piece_tokenizer_multi_threaded, iterations=1, rounds=3)
+
+    def test_rust_sentence_piece_tokenizer_thread_pool(self, benchmark):
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_sentence_piece_tokenizer_thread_pool, iterations=1, rounds=3)
 
     def test_rust_sentence_piece_encoding_single_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_sentence_piece_encoding_single_threaded, setup=self.setup_rust_tokenizer,
-                           iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_sentence_piece_encoding_single_threaded, iterations=1, rounds=3)
 
     def test_rust_sentence_piece_encoding_multi_threaded(self, benchmark):
-        benchmark.pedantic(self.rust_sentence_piece_encoding_multi_threaded, setup=self.setup_rust_tokenizer,
-                           iterations=1,
-                           rounds=3)
+        benchmark.extra_info['unique_ratio'] = unique_ratio(self.texts)
+        benchmark.pedantic(self.rust_sentence_piece_encoding_multi_threaded, iterations=1, rounds=3)
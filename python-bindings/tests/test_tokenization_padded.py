@@ -0,0 +1,88 @@
+# Copyright 2019 Guillaume Becquin
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from utils import CACHE_ROOT, to_padded_array
+
+# Sentences of different lengths, the last one longer than `MAX_LEN` tokens so that it is truncated
+TEXTS = [
+    'Hello',
+    'The quick brown fox jumps over the lazy dog.',
+    '',
+    'Deep learning is part of a broader family of machine learning methods based on artificial neural networks, '
+    'learning can be supervised, semi-supervised or unsupervised.',
+]
+MAX_LEN = 16
+
+
+@pytest.mark.parametrize('num_threads', [None, 1, 2])
+class TestTokenizationPadded:
+    def test_encode_list_padded(self, rust_bert_tokenizer, num_threads):
+        # Given
+        expected_ids = to_padded_array(
+            [encoding.token_ids for encoding in rust_bert_tokenizer.encode_list(TEXTS,
+                                                                               max_len=MAX_LEN,
+                                                                               truncation_strategy='longest_first',
+                                                                               stride=0)],
+            pad_id=-1)
+
+        # When
+        input_ids = rust_bert_tokenizer.encode_list_padded(TEXTS,
+                                                           max_len=MAX_LEN,
+                                                           truncation_strategy='longest_first',
+                                                           stride=0,
+                                                           pad_id=-1,
+                                                           num_threads=num_threads)
+
+        # Then
+        assert input_ids.dtype == np.int64
+        assert input_ids.shape == (len(TEXTS), MAX_LEN)
+        assert np.array_equal(input_ids, expected_ids)
+
+    def test_encode_list_padded_empty_batch(self, rust_bert_tokenizer, num_threads):
+        # When
+        input_ids, attention_mask, token_type_ids = rust_bert_tokenizer.encode_list_padded_with_masks(
+            [], max_len=MAX_LEN, truncation_strategy='longest_first', stride=0, num_threads=num_threads)
+
+        # Then
+        assert rust_bert_tokenizer.encode_list_padded([], max_len=MAX_LEN, truncation_strategy='longest_first',
+                                                      stride=0, num_threads=num_threads).shape == (0, 0)
+        assert input_ids.shape == attention_mask.shape == token_type_ids.shape == (0, 0)
+
+    def test_encode_list_padded_with_masks(self, rust_bert_tokenizer, num_threads):
+        from transformers import BertTokenizer
+        # Given
+        base_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased', do_lower_case=True, cache_dir=CACHE_ROOT)
+        output_baseline = base_tokenizer(TEXTS, max_length=MAX_LEN, truncation=True, padding=True,
+                                         return_tensors='np')
+
+        # When
+        input_ids, attention_mask, token_type_ids = rust_bert_tokenizer.encode_list_padded_with_masks(
+            TEXTS,
+            max_len=MAX_LEN,
+            truncation_strategy='longest_first',
+            stride=0,
+            pad_id=base_tokenizer.pad_token_id,
+            num_threads=num_threads)
+
+        # Then
+        assert (input_ids.dtype, attention_mask.dtype, token_type_ids.dtype) == (np.int64, np.int8, np.int8)
+        assert input_ids.shape == attention_mask.shape == token_type_ids.shape == output_baseline['input_ids'].shape
+        assert np.array_equal(input_ids, output_baseline['input_ids'])
+        assert np.array_equal(attention_mask, output_baseline['attention_mask'])
+        assert np.array_equal(token_type_ids, output_baseline['token_type_ids'])
+        assert np.array_equal(input_ids, rust_bert_tokenizer.encode_list_padded(TEXTS,
+                                                                                max_len=MAX_LEN,
+                                                                                truncation_strategy='longest_first',
+                                                                                stride=0,
+                                                                                pad_id=base_tokenizer.pad_token_id,
+                                                                                num_threads=num_threads))
@@ -10,122 +10,137 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tempfile
-from pathlib import Path
-from zipfile import ZipFile
+import functools
 
 import pytest
-import requests
-import sentencepiece
-from rust_tokenizers.rust_tokenizers import PySentencePieceTokenizer
-from transformers.data.processors.glue import QnliProcessor
-from transformers.file_utils import get_from_cache
-from transformers import BertTokenizer
-from transformers import DistilBertTokenizer
-from rust_tokenizers import PyBertTokenizer
 import re
+from utils import CACHE_ROOT, cached_baseline, encode_in_processes, mismatch_span, mismatched_rows, \
+    spawn_process_pool, tokenizer_options
+
+MULTIPLE_SPACES = re.compile(' +')
+PAIR_CHUNK_SIZE = 4096
+BASELINE_CHUNK_SIZE = 256
+BASELINE_ENCODE_OPTIONS = dict(add_special_tokens=True,
+                               return_special_tokens_mask=True,
+                               max_length=128,
+                               truncation='longest_first')
+BASELINE_KEYS = ('input_ids', 'token_type_ids', 'special_tokens_mask')
+_baseline_tokenizer = None
+_sentence_piece_processor = None
+
+
+def collapse_spaces(text):
+    """Strips the text and collapses runs of spaces, skipping the regex for the common case without any"""
+    text = text.strip()
+    return MULTIPLE_SPACES.sub(' ', text) if '  ' in text else text
+
+
+def pair_length(pair):
+    return len(pair[0]) + len(pair[1])
+
+
+def _load_baseline_tokenizer(tokenizer):
+    global _baseline_tokenizer
+    _baseline_tokenizer = tokenizer
+
+
+def _encode_baseline_chunk(pairs):
+    encodings = _baseline_tokenizer.batch_encode_plus(pairs, **BASELINE_ENCODE_OPTIONS)
+    keys = [key for key in BASELINE_KEYS if key in encodings]
+    return [dict(zip(keys, values)) for values in zip(*(encodings[key] for key in keys))]
+
+
+def _load_sentence_piece(model_path):
+    import sentencepiece
+    global _sentence_piece_processor
+    _sentence_piece_processor = sentencepiece.SentencePieceProcessor()
+    _sentence_piece_processor.Load(model_path)
+
+
+def _encode_sentence_piece_chunk(texts):
+    return [_sentence_piece_processor.EncodeAsIds(text) for text in texts]
+
+
+def encode_sentence_piece_texts(model_path, texts, chunk_size=1024):
+    """Encodes the texts with the Python SentencePiece processor across worker processes that each load the model
+    once"""
+    with spawn_process_pool(_load_sentence_piece, (model_path,)) as pool:
+        return encode_in_processes(pool, _encode_sentence_piece_chunk, texts, chunk_size)
 
 
 @pytest.mark.slow
 class TestTokenizationQNLI:
+    @pytest.fixture(autouse=True)
+    def load_examples(self, qnli_unique_pairs, qnli_unique_questions, xlnet_spiece_path):
+        self.pairs = qnli_unique_pairs
+        self.questions = qnli_unique_questions
+        self.spiece_model = xlnet_spiece_path
+
     def setup_class(self):
-        self.processor = QnliProcessor()
-        self.test_dir = Path(tempfile.mkdtemp())
-        qnli_url = 'https://dl.fbaipublicfiles.com/glue/data/QNLIv2.zip'
-        contents = requests.get(qnli_url)
-        (self.test_dir / 'QNLI.zip').open('wb').write(contents.content)
-        with ZipFile(self.test_dir / 'QNLI.zip', 'r') as zipObj:
-            zipObj.extractall(self.test_dir)
-        self.examples = self.processor.get_train_examples(self.test_dir / 'QNLI')
-        sentence_piece_url = 'https://s3.amazonaws.com/models.huggingface.co/bert/xlnet-base-cased-spiece.model'
-        contents = requests.get(sentence_piece_url)
-        (self.test_dir / 'spiece.model').open('wb').write(contents.content)
-
-    def test_tokenization_bert(self):
+        self.test_dir = CACHE_ROOT
+
+    @pytest.mark.parametrize('baseline_class, model_name, do_lower_case, rust_tokenizer_fixture', [
+        ('BertTokenizer', 'bert-base-uncased', True, 'rust_bert_tokenizer'),
+        ('DistilBertTokenizer', 'distilbert-base-cased', False, 'rust_distilbert_tokenizer'),
+    ], ids=['bert', 'distilbert'])
+    def test_tokenization_bert(self, request, baseline_class, model_name, do_lower_case, rust_tokenizer_fixture):
+        import transformers
         # Given
-        self.base_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased',
-                                                            do_lower_case=True,
-                                                            cache_dir=self.test_dir)
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased']),
-            do_lower_case=True,
-            strip_accents=True)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   text_pair=example.text_b,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+        self.base_tokenizer = getattr(transformers, baseline_class).from_pretrained(model_name,
+                                                                                    do_lower_case=do_lower_case,
+                                                                                    cache_dir=self.test_dir)
+        self.rust_tokenizer = request.getfixturevalue(rust_tokenizer_fixture)
+        baseline_options = (tokenizer_options(self.base_tokenizer, model_name), BASELINE_ENCODE_OPTIONS)
+        # DistilBERT does not take segment ids, its tokenizer only returns them when asked to
+        compare_segment_ids = 'token_type_ids' in self.base_tokenizer.model_input_names
 
-        # When
-        output_rust = self.rust_tokenizer.encode_pair_list(
-            [(example.text_a, example.text_b) for example in self.examples],
-            max_len=128,
-            truncation_strategy='longest_first',
-            stride=0)
+        # Pairs are tokenized and compared chunk by chunk, so that only one chunk of outputs is alive at a time. The
+        # reference Python tokenizer encodes each chunk across worker processes, which only start on a cache miss.
+        with spawn_process_pool(_load_baseline_tokenizer, (self.base_tokenizer,)) as pool:
+            encode_baseline_pairs = functools.partial(encode_in_processes, pool, _encode_baseline_chunk,
+                                                      chunk_size=BASELINE_CHUNK_SIZE, length=pair_length)
+            for chunk_start in range(0, len(self.pairs), PAIR_CHUNK_SIZE):
+                pairs = self.pairs[chunk_start:chunk_start + PAIR_CHUNK_SIZE]
+                output_baseline = cached_baseline(f'qnli_{model_name}', pairs, encode_baseline_pairs,
+                                                  baseline_options)
 
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-            assert (rust.segment_ids == baseline['token_type_ids'])
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_distilbert(self):
-        # Given
-        self.base_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-cased',
-                                                                  do_lower_case=False,
-                                                                  cache_dir=self.test_dir)
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-cased']),
-            do_lower_case=False,
-            strip_accents=False)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   text_pair=example.text_b,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+                # When
+                output_rust = self.rust_tokenizer.encode_pair_list(
+                    pairs,
+                    max_len=128,
+                    truncation_strategy='longest_first',
+                    stride=0)
 
-        # When
-        output_rust = self.rust_tokenizer.encode_pair_list(
-            [(example.text_a, example.text_b) for example in self.examples],
-            max_len=128,
-            truncation_strategy='longest_first',
-            stride=0)
+                # Then
+                assert len(output_rust) == len(output_baseline)
+                for idx in mismatched_rows([rust.token_ids for rust in output_rust],
+                                           [baseline['input_ids'] for baseline in output_baseline]):
+                    rust, baseline = output_rust[idx], output_baseline[idx]['input_ids']
+                    assert rust.token_ids == baseline, \
+                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
+                        f'Sentence a: {pairs[idx][0]} \n' \
+                        f'Sentence b: {pairs[idx][1]} \n' \
+                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline)} \n' \
+                        f'Rust: {rust.token_ids} \n' \
+                        f'Python {baseline}'
+                if compare_segment_ids:
+                    assert mismatched_rows([rust.segment_ids for rust in output_rust],
+                                           [baseline['token_type_ids'] for baseline in output_baseline]).size == 0
+                assert mismatched_rows([rust.special_tokens_mask for rust in output_rust],
+                                       [baseline['special_tokens_mask'] for baseline in output_baseline]).size == 0
 
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-
-    def test_tokenization_sentence_piece(self):
+    def test_tokenization_sentence_piece(self, rust_xlnet_sentence_piece_tokenizer):
+        import sentencepiece
         # Given
         self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'spiece.model'))
-        self.rust_tokenizer = PySentencePieceTokenizer(str(self.test_dir / 'spiece.model'), do_lower_case=False)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.EncodeAsIds(example.text_a))
+        self.base_tokenizer.Load(self.spiece_model)
+        self.rust_tokenizer = rust_xlnet_sentence_piece_tokenizer
+        output_baseline = encode_sentence_piece_texts(self.spiece_model, self.questions)
 
         # When
         # Note: the original sentence piece tokenizer strips trailing spaces and deletes consecutive spaces
         output_rust = self.rust_tokenizer.encode_list(
-            [re.sub(' +', ' ', example.text_a.strip()) for example in self.examples],
+            [collapse_spaces(question) for question in self.questions],
             max_len=256,
             truncation_strategy='longest_first',
             stride=0)
@@ -136,44 +151,19 @@ class TestTokenizationQNLI:
                 assert sum(self.base_tokenizer.get_score(baseline)) == \
                        sum(self.base_tokenizer.get_score(rust.token_ids)), \
                     f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                    f'Sentence a: {self.examples[idx].text_a} \n' \
-                    f'Sentence b: {self.examples[idx].text_b} \n' \
+                    f'Sentence: {self.questions[idx]} \n' \
                     f'Token mismatch: {self.get_token_diff_sentence_piece(rust.token_ids, baseline)} \n' \
                     f'Rust: {rust.token_ids} \n' \
                     f'Python {baseline}'
 
     def get_token_diff(self, rust_tokens, python_tokens):
-        last_index = 1
-        first_index = 0
-        max_index = min(len(rust_tokens), len(python_tokens))
-        while rust_tokens[first_index] == python_tokens[first_index] and first_index < max_index - 1:
-            first_index += 1
-        first_index -= 1
-        while rust_tokens[-last_index] == python_tokens[-last_index] and first_index < max_index - 1:
-            last_index += 1
-        last_index += 1
-        python_last_index = len(python_tokens) + last_index
-        rust_last_index = len(rust_tokens) + last_index
-        rust_tokens_diff = rust_tokens[first_index:rust_last_index]
-        python_token_diff = python_tokens[first_index:python_last_index]
-        rust_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(rust_tokens_diff)
-        python_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(python_token_diff)
+        start, rust_end, python_end = mismatch_span(rust_tokens, python_tokens)
+        rust_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(rust_tokens[start:rust_end])
+        python_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(python_tokens[start:python_end])
         return rust_decoded_tokens, python_decoded_tokens
 
     def get_token_diff_sentence_piece(self, rust_tokens, python_tokens):
-        last_index = 1
-        first_index = 0
-        max_index = min(len(rust_tokens), len(python_tokens))
-        while rust_tokens[first_index] == python_tokens[first_index] and first_index < max_index - 1:
-            first_index += 1
-        first_index -= 1
-        while rust_tokens[-last_index] == python_tokens[-last_index] and last_index < max_index - 1:
-            last_index += 1
-        last_index += 1
-        python_last_index = len(python_tokens) + last_index
-        rust_last_index = len(rust_tokens) + last_index
-        rust_tokens_diff = rust_tokens[first_index:rust_last_index]
-        python_token_diff = python_tokens[first_index:python_last_index]
-        rust_decoded_tokens = self.base_tokenizer.DecodeIds(rust_tokens_diff)
-        python_decoded_tokens = self.base_tokenizer.DecodeIds(python_token_diff)
+        start, rust_end, python_end = mismatch_span(rust_tokens, python_tokens)
+        rust_decoded_tokens = self.base_tokenizer.DecodeIds(rust_tokens[start:rust_end])
+        python_decoded_tokens = self.base_tokenizer.DecodeIds(python_tokens[start:python_end])
         return rust_decoded_tokens, python_decoded_tokens
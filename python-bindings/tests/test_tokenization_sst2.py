@@ -10,745 +10,296 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tempfile
-from pathlib import Path
+import functools
+import os
+
+import numpy as np
 import pytest
-from transformers import AlbertTokenizer, T5Tokenizer, XLMRobertaTokenizer, XLNetTokenizer, ReformerTokenizer, \
-    ProphetNetTokenizer, PegasusTokenizer, MBart50Tokenizer, M2M100Tokenizer
-from transformers.data.processors.glue import Sst2Processor
-from transformers.file_utils import get_from_cache
-from transformers import BertTokenizer
-from transformers import DistilBertTokenizer
-from transformers import CTRLTokenizer
-from transformers import GPT2Tokenizer
-from transformers import RobertaTokenizer
-from transformers import OpenAIGPTTokenizer
 from rust_tokenizers import PyBertTokenizer, PyCtrlTokenizer, PyGpt2Tokenizer, PyRobertaTokenizer, \
     PyOpenAiGptTokenizer, PyAlbertTokenizer, PyT5Tokenizer, PyXLNetTokenizer, PyReformerTokenizer, \
-    PyProphetNetTokenizer, PyPegasusTokenizer, PySentencePieceTokenizer, PyXLMRobertaTokenizer, \
-    PyMBart50Tokenizer, PySentencePieceBpeTokenizer, PyM2M100Tokenizer
-from zipfile import ZipFile
-import requests
-import sentencepiece
-from collections import Counter
+    PyProphetNetTokenizer, PyPegasusTokenizer, PyXLMRobertaTokenizer, \
+    PyMBart50Tokenizer, PySentencePieceTokenizer, PySentencePieceBpeTokenizer, PyM2M100Tokenizer
+from utils import CACHE_ROOT, cached_baseline, cached_pretrained_file, encode_list_sharded, mismatch_span, \
+    mismatched_rows, encode_in_processes, spawn_process_pool, tokenizer_options
+
+TOKEN_IDS = ('token_ids', 'input_ids')
+RAW_TOKEN_IDS = ('token_ids', None)
+SEGMENT_IDS = ('segment_ids', 'token_type_ids')
+SPECIAL_TOKENS_MASK = ('special_tokens_mask', 'special_tokens_mask')
+# A single Rust tokenizer instance scales poorly past this many threads, larger machines split the batch over
+# several instances
+RUST_THREADS_PER_SHARD = 16
+RUST_SHARDS = max(1, os.cpu_count() // RUST_THREADS_PER_SHARD)
+BASELINE_ENCODE_OPTIONS = dict(add_special_tokens=True,
+                               return_special_tokens_mask=True,
+                               truncation='longest_first',
+                               max_length=128)
+BASELINE_CHUNK_SIZE = 4096
+_baseline_tokenizer = None
+
+
+def batch_encode_plus(tokenizer, texts, **kwargs):
+    """Encodes all texts in one batch call and splits the compared columns back into one dict per text"""
+    encodings = tokenizer.batch_encode_plus(texts, **kwargs)
+    keys = [key for key in ('input_ids', 'token_type_ids', 'special_tokens_mask') if key in encodings]
+    return [dict(zip(keys, values)) for values in zip(*(encodings[key] for key in keys))]
+
+
+def _load_baseline_tokenizer(tokenizer):
+    global _baseline_tokenizer
+    _baseline_tokenizer = tokenizer
+
+
+def _encode_baseline_chunk(texts):
+    return batch_encode_plus(_baseline_tokenizer, texts, **BASELINE_ENCODE_OPTIONS)
+
+
+def encode_baseline_texts(tokenizer, texts):
+    """Encodes the texts with the Python tokenizer across worker processes that each receive the tokenizer once"""
+    with spawn_process_pool(_load_baseline_tokenizer, (tokenizer,)) as pool:
+        return encode_in_processes(pool, _encode_baseline_chunk, texts, BASELINE_CHUNK_SIZE)
+
+
+def mismatched_examples(output_rust, output_baseline, *fields):
+    """Returns the indices of the examples where any (Rust attribute, baseline key) field differs, found with one
+    vectorized comparison per field so that the per-example checks only run on mismatches. A `None` key compares
+    against the baseline items as is."""
+    assert len(output_rust) == len(output_baseline)
+    mismatches = set()
+    for rust_field, baseline_key in fields:
+        baseline_values = output_baseline if baseline_key is None \
+            else [baseline[baseline_key] for baseline in output_baseline]
+        rust_values = [getattr(rust, rust_field) for rust in output_rust]
+        mismatches.update(mismatched_rows(rust_values, baseline_values).tolist())
+    return sorted(mismatches)
+
+
+def same_tokens_in_any_order(rust_tokens, python_tokens):
+    """Checks whether two token id sequences hold the same ids with the same counts, comparing sorted arrays"""
+    return len(rust_tokens) == len(python_tokens) and \
+        np.array_equal(np.sort(np.asarray(rust_tokens, dtype=np.int32)),
+                       np.sort(np.asarray(python_tokens, dtype=np.int32)))
+
+
+def rust_from_pretrained_files(rust_class, *file_keys, **kwargs):
+    """Builds the Rust tokenizer from the files of the baseline's pretrained model, passed in the order of
+    `file_keys`"""
+
+    def build(base_tokenizer, model_name):
+        return rust_class(*[cached_pretrained_file(base_tokenizer.pretrained_vocab_files_map[file_key][model_name])
+                            for file_key in file_keys], **kwargs)
+
+    return build
+
+
+def rust_from_urls(rust_class, *urls, **kwargs):
+    """Builds the Rust tokenizer from the files at `urls`"""
+
+    def build(base_tokenizer, model_name):
+        return rust_class(*[cached_pretrained_file(url) for url in urls], **kwargs)
+
+    return build
+
+
+# (name, baseline class, model name, baseline options, Rust tokenizer builder, compared fields)
+# The Rust tokenizers are given the raw texts
+TOKENIZERS = [
+    ('bert', 'BertTokenizer', 'bert-base-uncased', {'do_lower_case': True},
+     rust_from_pretrained_files(PyBertTokenizer, 'vocab_file', do_lower_case=True, strip_accents=True),
+     (TOKEN_IDS, SEGMENT_IDS, SPECIAL_TOKENS_MASK)),
+    ('distilbert', 'DistilBertTokenizer', 'distilbert-base-cased', {'do_lower_case': False},
+     rust_from_pretrained_files(PyBertTokenizer, 'vocab_file', do_lower_case=False, strip_accents=False),
+     (TOKEN_IDS,)),
+    ('ctrl', 'CTRLTokenizer', 'ctrl', {},
+     rust_from_pretrained_files(PyCtrlTokenizer, 'vocab_file', 'merges_file', do_lower_case=True),
+     (TOKEN_IDS, SEGMENT_IDS, SPECIAL_TOKENS_MASK)),
+    ('gpt2', 'GPT2Tokenizer', 'gpt2', {},
+     rust_from_pretrained_files(PyGpt2Tokenizer, 'vocab_file', 'merges_file', do_lower_case=True),
+     (TOKEN_IDS, SPECIAL_TOKENS_MASK)),
+    ('roberta', 'RobertaTokenizer', 'roberta-base', {},
+     rust_from_pretrained_files(PyRobertaTokenizer, 'vocab_file', 'merges_file', do_lower_case=True,
+                                add_prefix_space=False),
+     (TOKEN_IDS, SPECIAL_TOKENS_MASK)),
+    ('openai_gpt', 'OpenAIGPTTokenizer', 'openai-gpt', {'do_lower_case': True},
+     rust_from_pretrained_files(PyOpenAiGptTokenizer, 'vocab_file', 'merges_file', do_lower_case=True),
+     (TOKEN_IDS, SPECIAL_TOKENS_MASK)),
+    ('reformer', 'ReformerTokenizer', 'google/reformer-crime-and-punishment', {'do_lower_case': False},
+     rust_from_pretrained_files(PyReformerTokenizer, 'vocab_file', do_lower_case=False),
+     (TOKEN_IDS, SPECIAL_TOKENS_MASK)),
+    ('prophetnet', 'ProphetNetTokenizer', 'microsoft/prophetnet-large-uncased',
+     {'do_lower_case': True, 'strip_accents': True},
+     rust_from_pretrained_files(PyProphetNetTokenizer, 'vocab_file', do_lower_case=True, strip_accents=True),
+     (TOKEN_IDS, SEGMENT_IDS, SPECIAL_TOKENS_MASK)),
+]
+
+# (name, baseline class, model name, baseline options, Rust tokenizer builder, source language)
+# The Rust tokenizers are given the stripped texts, prefixed with the language code when a source language is set
+SENTENCE_PIECE_TOKENIZERS = [
+    ('albert', 'AlbertTokenizer', 'albert-base-v2', {'do_lower_case': True},
+     rust_from_pretrained_files(PyAlbertTokenizer, 'vocab_file', do_lower_case=True, strip_accents=True),
+     None),
+    ('xlnet', 'XLNetTokenizer', 'xlnet-base-cased', {'do_lower_case': False},
+     rust_from_pretrained_files(PyXLNetTokenizer, 'vocab_file', do_lower_case=False, strip_accents=True),
+     None),
+    ('t5', 'T5Tokenizer', 't5-base', {'do_lower_case': False},
+     rust_from_pretrained_files(PyT5Tokenizer, 'vocab_file', do_lower_case=False),
+     None),
+    ('xlm_roberta', 'XLMRobertaTokenizer', 'xlm-roberta-large-finetuned-conll03-english', {'do_lower_case': False},
+     rust_from_pretrained_files(PyXLMRobertaTokenizer, 'vocab_file', do_lower_case=False),
+     None),
+    ('pegasus', 'PegasusTokenizer', 'google/pegasus-cnn_dailymail', {},
+     rust_from_urls(PyPegasusTokenizer, 'https://cdn.huggingface.co/google/pegasus-cnn_dailymail/spiece.model',
+                    do_lower_case=False),
+     None),
+    ('mbart50', 'MBart50Tokenizer', 'facebook/mbart-large-50-many-to-many-mmt', {'do_lower_case': False},
+     rust_from_urls(
+         PyMBart50Tokenizer,
+         'https://huggingface.co/facebook/mbart-large-50-many-to-many-mmt/resolve/main/sentencepiece.bpe.model',
+         do_lower_case=False),
+     ('fr_XX', '>>fr<< ')),
+    ('m2m100', 'M2M100Tokenizer', 'facebook/m2m100_418M', {'do_lower_case': False},
+     rust_from_urls(PyM2M100Tokenizer,
+                    'https://huggingface.co/facebook/m2m100_418M/resolve/main/vocab.json',
+                    'https://huggingface.co/facebook/m2m100_418M/resolve/main/sentencepiece.bpe.model',
+                    do_lower_case=False),
+     ('fr', '>>fr.<< ')),
+]
 
 
 @pytest.mark.slow
 class TestTokenizationSST2:
-    def setup_class(self):
-        self.processor = Sst2Processor()
-        self.test_dir = Path(tempfile.mkdtemp())
-        sst2_url = 'https://dl.fbaipublicfiles.com/glue/data/SST-2.zip'
-        contents = requests.get(sst2_url)
-        (self.test_dir / 'SST-2.zip').open('wb').write(contents.content)
-        with ZipFile(self.test_dir / 'SST-2.zip', 'r') as zipObj:
-            zipObj.extractall(self.test_dir)
-        self.examples = self.processor.get_train_examples(self.test_dir / 'SST-2')
-        sentence_piece_url = 'https://s3.amazonaws.com/models.huggingface.co/bert/xlnet-base-cased-spiece.model'
-        contents = requests.get(sentence_piece_url)
-        (self.test_dir / 'spiece.model').open('wb').write(contents.content)
-        sentence_piece_bpe_url = 'https://huggingface.co/facebook/m2m100_418M/resolve/main/sentencepiece.bpe.model'
-        contents = requests.get(sentence_piece_bpe_url)
-        (self.test_dir / 'spiece.bpe.model').open('wb').write(contents.content)
-
-    def test_tokenization_bert(self):
-        # Given
-        self.base_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased',
-                                                            do_lower_case=True,
-                                                            cache_dir=self.test_dir)
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['bert-base-uncased']),
-            do_lower_case=True,
-            strip_accents=True)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f' Python {baseline["input_ids"]}'
-            assert (rust.segment_ids == baseline['token_type_ids'])
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_distilbert(self):
-        # Given
-        self.base_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-cased',
-                                                                  do_lower_case=False,
-                                                                  cache_dir=self.test_dir)
-        self.rust_tokenizer = PyBertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['distilbert-base-cased']),
-            do_lower_case=False,
-            strip_accents=False)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-
-    def test_tokenization_ctrl(self):
-        # Given
-        self.base_tokenizer = CTRLTokenizer.from_pretrained('ctrl',
-                                                            do_lower_case=True,
-                                                            cache_dir=self.test_dir)
-        self.rust_tokenizer = PyCtrlTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['ctrl']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['ctrl']),
-            do_lower_case=True
-        )
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-            assert (rust.segment_ids == baseline['token_type_ids'])
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_gpt2(self):
-        # Given
-        self.base_tokenizer = GPT2Tokenizer.from_pretrained('gpt2',
-                                                            do_lower_case=True,
-                                                            cache_dir=self.test_dir)
-        self.rust_tokenizer = PyGpt2Tokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['gpt2']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['gpt2']), do_lower_case=True
-        )
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_roberta(self):
-        # Given
-        self.base_tokenizer = RobertaTokenizer.from_pretrained('roberta-base',
-                                                               do_lower_case=True,
-                                                               cache_dir=self.test_dir)
-        self.rust_tokenizer = PyRobertaTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['roberta-base']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['roberta-base']),
-            do_lower_case=True,
-            add_prefix_space=False
-        )
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   truncation='longest_first',
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_openai_gpt(self):
-        # Given
-        self.base_tokenizer = OpenAIGPTTokenizer.from_pretrained('openai-gpt',
-                                                                 do_lower_case=True,
-                                                                 cache_dir=self.test_dir)
-        self.rust_tokenizer = PyOpenAiGptTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['openai-gpt']),
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['merges_file']['openai-gpt']),
-            do_lower_case=True
-        )
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_sentence_piece(self):
-        # Given
-        self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'spiece.bpe.model'))
-        self.rust_tokenizer = PySentencePieceBpeTokenizer(str(self.test_dir / 'spiece.bpe.model'), do_lower_case=False)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.EncodeAsIds(example.text_a))
-
-        # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline:
-                assert sum(self.base_tokenizer.get_score(baseline)) == \
-                       sum(self.base_tokenizer.get_score(rust.token_ids)), \
-                    f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                    f'Sentence a: {self.examples[idx].text_a} \n' \
-                    f'Sentence b: {self.examples[idx].text_b} \n' \
-                    f'Token mismatch: {self.get_token_diff_sentence_piece(rust.token_ids, baseline)} \n' \
-                    f'Rust: {rust.token_ids} \n' \
-                    f'Python {baseline}'
-
-    def test_tokenization_sentence_piece_bpe(self):
-        # Given
-        self.base_tokenizer = sentencepiece.SentencePieceProcessor()
-        self.base_tokenizer.Load(str(self.test_dir / 'spiece.model'))
-        self.rust_tokenizer = PySentencePieceTokenizer(str(self.test_dir / 'spiece.model'), do_lower_case=False)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.EncodeAsIds(example.text_a))
+    @pytest.fixture(autouse=True)
+    def load_examples(self, sst2_suite_downloads, sst2_texts, sst2_stripped_texts, thread_pool):
+        self.texts = sst2_texts
+        self.stripped_texts = sst2_stripped_texts
+        self.thread_pool = thread_pool
 
-        # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline:
-                assert sum(self.base_tokenizer.get_score(baseline)) == \
-                       sum(self.base_tokenizer.get_score(rust.token_ids)), \
-                    f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                    f'Sentence a: {self.examples[idx].text_a} \n' \
-                    f'Sentence b: {self.examples[idx].text_b} \n' \
-                    f'Token mismatch: {self.get_token_diff_sentence_piece(rust.token_ids, baseline)} \n' \
-                    f'Rust: {rust.token_ids} \n' \
-                    f'Python {baseline}'
-
-    def test_tokenization_albert(self):
-        # Given
-        self.base_tokenizer = AlbertTokenizer.from_pretrained('albert-base-v2',
-                                                              do_lower_case=True,
-                                                              cache_dir=self.test_dir)
-        self.rust_tokenizer = PyAlbertTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['albert-base-v2']),
-            do_lower_case=True,
-            strip_accents=True)
-
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_xlnet(self):
-        # Given
-        self.base_tokenizer = XLNetTokenizer.from_pretrained('xlnet-base-cased',
-                                                             do_lower_case=False,
-                                                             cache_dir=self.test_dir)
-        self.rust_tokenizer = PyXLNetTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['xlnet-base-cased']),
-            do_lower_case=False,
-            strip_accents=True)
-
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
+    def setup_class(self):
+        self.test_dir = CACHE_ROOT
 
-    def test_tokenization_t5(self):
+    @pytest.mark.parametrize('name, baseline_class, model_name, baseline_options, build_rust_tokenizer, fields',
+                             TOKENIZERS, ids=[tokenizer[0] for tokenizer in TOKENIZERS])
+    def test_tokenization(self, name, baseline_class, model_name, baseline_options, build_rust_tokenizer, fields):
+        import transformers
         # Given
-        self.base_tokenizer = T5Tokenizer.from_pretrained('t5-base',
-                                                          do_lower_case=False,
-                                                          cache_dir=self.test_dir)
-        self.rust_tokenizer = PyT5Tokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['t5-base']),
-            do_lower_case=False)
-
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+        self.base_tokenizer = getattr(transformers, baseline_class).from_pretrained(model_name,
+                                                                                    cache_dir=self.test_dir,
+                                                                                    **baseline_options)
+        shards = [build_rust_tokenizer(self.base_tokenizer, model_name) for _ in range(RUST_SHARDS)]
+        self.rust_tokenizer = shards[0]
+        # The Rust tokenizers release the GIL: their batch is encoded on the pool while the baseline is built
+        future_rust = self.thread_pool.submit(self.encode_rust, shards, self.texts, 128)
+        output_baseline = cached_baseline(f'sst2_{name}', self.texts,
+                                          functools.partial(encode_baseline_texts, self.base_tokenizer),
+                                          (tokenizer_options(self.base_tokenizer, model_name),
+                                           BASELINE_ENCODE_OPTIONS))
 
         # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
+        output_rust = future_rust.result()
 
         # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
+        for idx in mismatched_examples(output_rust, output_baseline, *fields):
+            rust, baseline = output_rust[idx], output_baseline[idx]
             if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_xlm_roberta(self):
+                raise AssertionError(self.mismatch_message(idx, rust.token_ids, baseline['input_ids']))
+            if SEGMENT_IDS in fields:
+                assert (rust.segment_ids == baseline['token_type_ids'])
+            if SPECIAL_TOKENS_MASK in fields:
+                assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
+
+    @pytest.mark.parametrize('name, baseline_class, model_name, baseline_options, build_rust_tokenizer, language',
+                             SENTENCE_PIECE_TOKENIZERS, ids=[tokenizer[0] for tokenizer in SENTENCE_PIECE_TOKENIZERS])
+    def test_tokenization_sentence_piece_model(self, name, baseline_class, model_name, baseline_options,
+                                               build_rust_tokenizer, language):
+        import transformers
         # Given
-        self.base_tokenizer = XLMRobertaTokenizer.from_pretrained('xlm-roberta-large-finetuned-conll03-english',
-                                                                  do_lower_case=False,
-                                                                  cache_dir=self.test_dir)
-        self.rust_tokenizer = PyXLMRobertaTokenizer(
-            get_from_cache(self.base_tokenizer.pretrained_vocab_files_map['vocab_file'][
-                               'xlm-roberta-large-finetuned-conll03-english']),
-            do_lower_case=False)
-
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
+        rust_texts = self.stripped_texts
+        if language is not None:
+            # The source language is an init option so that the baseline cache key covers it
+            source_language, rust_prefix = language
+            baseline_options = dict(baseline_options, src_lang=source_language)
+            rust_texts = [rust_prefix + text for text in rust_texts]
+        self.base_tokenizer = getattr(transformers, baseline_class).from_pretrained(model_name,
+                                                                                    cache_dir=self.test_dir,
+                                                                                    **baseline_options)
+        shards = [build_rust_tokenizer(self.base_tokenizer, model_name) for _ in range(RUST_SHARDS)]
+        self.rust_tokenizer = shards[0]
         # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_reformer(self):
-        # Given
-        self.base_tokenizer = ReformerTokenizer.from_pretrained('google/reformer-crime-and-punishment',
-                                                                do_lower_case=False,
-                                                                cache_dir=self.test_dir)
-        self.rust_tokenizer = PyReformerTokenizer(
-            get_from_cache(
-                self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['google/reformer-crime-and-punishment']),
-            do_lower_case=True
-        )
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+        future_rust = self.thread_pool.submit(self.encode_rust, shards, rust_texts, 128)
+        output_baseline = cached_baseline(f'sst2_{name}', self.texts,
+                                          functools.partial(encode_baseline_texts, self.base_tokenizer),
+                                          (tokenizer_options(self.base_tokenizer, model_name),
+                                           BASELINE_ENCODE_OPTIONS))
 
         # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
+        output_rust = future_rust.result()
 
         # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f'Python {baseline["input_ids"]}'
+        for idx in mismatched_examples(output_rust, output_baseline, TOKEN_IDS, SPECIAL_TOKENS_MASK):
+            rust, baseline = output_rust[idx], output_baseline[idx]
+            if rust.token_ids != baseline['input_ids'] \
+                    and not same_tokens_in_any_order(rust.token_ids, baseline['input_ids']):
+                raise AssertionError(self.mismatch_message(idx, rust.token_ids, baseline['input_ids']))
             assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
 
-    def test_tokenization_prophetnet(self):
+    @pytest.mark.parametrize('name, model_fixture, build_rust_tokenizer', [
+        ('sentence_piece', 'm2m100_spiece_bpe_path',
+         lambda model_path: PySentencePieceBpeTokenizer(model_path, do_lower_case=False)),
+        ('sentence_piece_bpe', 'xlnet_spiece_path',
+         lambda model_path: PySentencePieceTokenizer(model_path, do_lower_case=False)),
+    ], ids=['sentence_piece', 'sentence_piece_bpe'])
+    def test_tokenization_sentence_piece(self, request, name, model_fixture, build_rust_tokenizer):
+        import sentencepiece
         # Given
-        self.base_tokenizer = ProphetNetTokenizer.from_pretrained('microsoft/prophetnet-large-uncased',
-                                                                  do_lower_case=True,
-                                                                  strip_accents=True,
-                                                                  cache_dir=self.test_dir)
-        self.rust_tokenizer = PyProphetNetTokenizer(
-            get_from_cache(
-                self.base_tokenizer.pretrained_vocab_files_map['vocab_file']['microsoft/prophetnet-large-uncased']),
-            do_lower_case=True,
-            strip_accents=True)
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        output_rust = self.rust_tokenizer.encode_list([example.text_a for example in self.examples],
-                                                      max_len=128,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            assert rust.token_ids == baseline[
-                'input_ids'], f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
-                              f'Sentence a: {self.examples[idx].text_a} \n' \
-                              f'Sentence b: {self.examples[idx].text_b} \n' \
-                              f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n' \
-                              f'Rust: {rust.token_ids} \n' \
-                              f' Python {baseline["input_ids"]}'
-            assert (rust.segment_ids == baseline['token_type_ids'])
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_pegasus(self):
-        # Given
-        self.base_tokenizer = PegasusTokenizer.from_pretrained('google/pegasus-cnn_dailymail',
-                                                               cache_dir=self.test_dir)
-        self.rust_tokenizer = PyPegasusTokenizer(
-            get_from_cache('https://cdn.huggingface.co/google/pegasus-cnn_dailymail/spiece.model'),
-            do_lower_case=False)
-
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
-        # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_mbart50(self):
-        # Given
-        self.base_tokenizer = MBart50Tokenizer.from_pretrained('facebook/mbart-large-50-many-to-many-mmt',
-                                                               do_lower_case=False,
-                                                               cache_dir=self.test_dir)
-        self.rust_tokenizer = PyMBart50Tokenizer(
-            get_from_cache(
-                'https://huggingface.co/facebook/mbart-large-50-many-to-many-mmt/resolve/main/sentencepiece.bpe.model'),
-            do_lower_case=False)
-        self.base_tokenizer.src_lang = "fr_XX"
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
-
-        # When
+        model_path = request.getfixturevalue(model_fixture)
+        self.base_tokenizer = sentencepiece.SentencePieceProcessor()
+        self.base_tokenizer.Load(model_path)
+        shards = [build_rust_tokenizer(model_path) for _ in range(RUST_SHARDS)]
+        self.rust_tokenizer = shards[0]
         # Note: the original sentence piece tokenizer strips trailing spaces
-        output_rust = self.rust_tokenizer.encode_list([">>fr<< " + example.text_a.strip() for example in self.examples],
-                                                      max_len=256,
-                                                      truncation_strategy='longest_first',
-                                                      stride=0)
-
-        # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
-
-    def test_tokenization_m2m100(self):
-        # Given
-        self.base_tokenizer = M2M100Tokenizer.from_pretrained('facebook/m2m100_418M',
-                                                              do_lower_case=False,
-                                                              cache_dir=self.test_dir)
-        self.rust_tokenizer = PyM2M100Tokenizer(
-            get_from_cache(
-                'https://huggingface.co/facebook/m2m100_418M/resolve/main/vocab.json'),
-            get_from_cache(
-                'https://huggingface.co/facebook/m2m100_418M/resolve/main/sentencepiece.bpe.model'),
-            do_lower_case=False)
-        self.base_tokenizer.src_lang = "fr"
-        output_baseline = []
-        for example in self.examples:
-            output_baseline.append(self.base_tokenizer.encode_plus(example.text_a,
-                                                                   add_special_tokens=True,
-                                                                   return_overflowing_tokens=True,
-                                                                   return_special_tokens_mask=True,
-                                                                   max_length=128))
+        future_rust = self.thread_pool.submit(self.encode_rust, shards, self.stripped_texts, 256)
+        output_baseline = cached_baseline(f'sst2_{name}', self.texts,
+                                          functools.partial(self.base_tokenizer.encode, out_type=int),
+                                          (str(model_path), {'out_type': 'int'}))
 
         # When
-        output_rust = self.rust_tokenizer.encode_list(
-            [">>fr.<< " + example.text_a.strip() for example in self.examples],
-            max_len=256,
-            truncation_strategy='longest_first',
-            stride=0)
+        output_rust = future_rust.result()
 
         # Then
-        for idx, (rust, baseline) in enumerate(zip(output_rust, output_baseline)):
-            if rust.token_ids != baseline['input_ids']:
-                if len(rust.token_ids) == len(baseline['input_ids']):
-                    if Counter(rust.token_ids) != Counter(baseline['input_ids']):
-                        raise AssertionError(
-                            f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                            f'Sentence a: {self.examples[idx].text_a} \n'
-                            f'Sentence b: {self.examples[idx].text_b} \n'
-                            f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                            f'Rust: {rust.token_ids} \n'
-                            f'Python {baseline["input_ids"]}')
-                else:
-                    raise AssertionError(
-                        f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n '
-                        f'Sentence a: {self.examples[idx].text_a} \n'
-                        f'Sentence b: {self.examples[idx].text_b} \n'
-                        f'Token mismatch: {self.get_token_diff(rust.token_ids, baseline["input_ids"])} \n'
-                        f'Rust: {rust.token_ids} \n'
-                        f'Python {baseline["input_ids"]}')
-            assert (rust.special_tokens_mask == baseline['special_tokens_mask'])
+        for idx in mismatched_examples(output_rust, output_baseline, RAW_TOKEN_IDS):
+            rust, baseline = output_rust[idx], output_baseline[idx]
+            if sum(self.base_tokenizer.get_score(baseline)) != sum(self.base_tokenizer.get_score(rust.token_ids)):
+                raise AssertionError(self.mismatch_message(idx, rust.token_ids, baseline,
+                                                           self.get_token_diff_sentence_piece))
+
+    def encode_rust(self, shards, texts, max_len):
+        """Encodes the texts with the independent Rust tokenizer instances in `shards`, one per
+        `RUST_THREADS_PER_SHARD` cores. The instances are built on the test's thread beforehand. Submitted to the pool
+        itself, it takes one worker on top of the `RUST_SHARDS` it maps over, which stays within the pool's
+        `os.cpu_count()` workers."""
+        return encode_list_sharded(shards, texts, self.thread_pool,
+                                   RUST_THREADS_PER_SHARD if RUST_SHARDS > 1 else None,
+                                   max_len=max_len,
+                                   truncation_strategy='longest_first',
+                                   stride=0)
+
+    def mismatch_message(self, idx, rust_tokens, python_tokens, get_token_diff=None):
+        """Formats the failure message of a mismatched example, only called once a check has failed"""
+        token_diff = (get_token_diff or self.get_token_diff)(rust_tokens, python_tokens)
+        return f'Difference in tokenization for {self.rust_tokenizer.__class__}: \n ' \
+               f'Sentence: {self.texts[idx]} \n' \
+               f'Token mismatch: {token_diff} \n' \
+               f'Rust: {rust_tokens} \n' \
+               f'Python {python_tokens}'
 
     def get_token_diff(self, rust_tokens, python_tokens):
-        last_index = 1
-        first_index = 0
-        max_index = min(len(rust_tokens), len(python_tokens))
-        while rust_tokens[first_index] == python_tokens[first_index] and first_index < max_index - 1:
-            first_index += 1
-        first_index -= 1
-        while rust_tokens[-last_index] == python_tokens[-last_index] and last_index < max_index - 1:
-            last_index += 1
-        last_index += 1
-        python_last_index = len(python_tokens) + last_index
-        rust_last_index = len(rust_tokens) + last_index
-        rust_tokens_diff = rust_tokens[first_index:rust_last_index]
-        python_token_diff = python_tokens[first_index:python_last_index]
-        rust_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(rust_tokens_diff)
-        python_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(python_token_diff)
+        start, rust_end, python_end = mismatch_span(rust_tokens, python_tokens)
+        rust_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(rust_tokens[start:rust_end])
+        python_decoded_tokens = self.base_tokenizer.convert_ids_to_tokens(python_tokens[start:python_end])
         return rust_decoded_tokens, python_decoded_tokens
 
     def get_token_diff_sentence_piece(self, rust_tokens, python_tokens):
-        last_index = 1
-        first_index = 0
-        max_index = min(len(rust_tokens), len(python_tokens))
-        while rust_tokens[first_index] == python_tokens[first_index] and first_index < max_index - 1:
-            first_index += 1
-        first_index -= 1
-        while rust_tokens[-last_index] == python_tokens[-last_index] and last_index < max_index - 1:
-            last_index += 1
-        last_index += 1
-        python_last_index = len(python_tokens) + last_index
-        rust_last_index = len(rust_tokens) + last_index
-        rust_tokens_diff = rust_tokens[first_index:rust_last_index]
-        python_token_diff = python_tokens[first_index:python_last_index]
-        rust_decoded_tokens = self.base_tokenizer.DecodeIds(rust_tokens_diff)
-        python_decoded_tokens = self.base_tokenizer.DecodeIds(python_token_diff)
+        start, rust_end, python_end = mismatch_span(rust_tokens, python_tokens)
+        rust_decoded_tokens = self.base_tokenizer.DecodeIds(rust_tokens[start:rust_end])
+        python_decoded_tokens = self.base_tokenizer.DecodeIds(python_tokens[start:python_end])
         return rust_decoded_tokens, python_decoded_tokens
@@ -0,0 +1,279 @@
+# Copyright 2019 Guillaume Becquin
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import csv
+import functools
+import hashlib
+import itertools
+import math
+import multiprocessing
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from zipfile import ZipFile
+
+import numpy as np
+
+CACHE_ROOT = Path(os.environ.get('RUST_TOKENIZERS_TEST_CACHE',
+                                 Path.home() / '.cache' / 'rust_tokenizers_tests'))
+
+# Benchmark batch of distinct sentences, extracted from https://en.wikipedia.org/wiki/Deep_learning
+DEEP_LEARNING_SENTENCES = [
+    'Deep learning (also known as deep structured learning or hierarchical learning) is part of a broader family of machine learning methods based on artificial neural networks.Learning can be supervised, semi-supervised or unsupervised.',
+    'Deep learning is a class of machine learning algorithms that[11](pp199–200) uses multiple layers to progressively extract higher level features from the raw input.',
+    'For example, in image processing, lower layers may identify edges, while higher layers may identify the concepts relevant to a human such as digits or letters or faces.',
+    'Most modern deep learning models are based on artificial neural networks, specifically, Convolutional Neural Networks (CNN)s, although they can also include propositional formulas organized layer-wise in deep generative models.',
+    'In deep learning, each level learns to transform its input data into a slightly more abstract and composite representation.',
+    'In an image recognition application, the raw input may be a matrix of pixels; the first representational layer may abstract the pixels and encode edges; the second layer may compose and encode arrangements of edges;',
+    'he third layer may encode a nose and eyes; and the fourth layer may recognize that the image contains a face. Importantly, a deep learning process can learn which features to optimally place in which level on its own.',
+    '(Of course, this does not completely eliminate the need for hand-tuning; for example, varying numbers of layers and layer sizes can provide different degrees of abstraction.)[',
+    'The word "deep" in "deep learning" refers to the number of layers through which the data is transformed. More precisely, deep learning systems have a substantial credit assignment path (CAP) depth. The CAP is the chain of transformations from input to output.',
+    'CAPs describe potentially causal connections between input and output. For a feedforward neural network, the depth of the CAPs is that of the network and is the number of hidden layers plus one (as the output layer is also parameterized).',
+    'For recurrent neural networks, in which a signal may propagate through a layer more than once, the CAP depth is potentially unlimited.[2] No universally agreed upon threshold of depth divides shallow learning from deep learning.',
+    'CAP of depth 2 has been shown to be a universal approximator in the sense that it can emulate any function.[14] Beyond that, more layers do not add to the function approximator ability of the network.',
+    'Deep models (CAP > 2) are able to extract better features than shallow models and hence, extra layers help in learning the features effectively. Deep learning architectures can be constructed with a greedy layer-by-layer method.',
+    'Deep learning helps to disentangle these abstractions and pick out which features improve performance.[1]. For supervised learning tasks, deep learning methods eliminate feature engineering, by translating the data into compact intermediate representations',
+    'Deep learning algorithms can be applied to unsupervised learning tasks. This is an important benefit because unlabeled data are more abundant than the labeled data. Examples of deep structures that can be trained in an unsupervised manner are neural history compressors and deep belief networks.',
+    'Deep neural networks are generally interpreted in terms of the universal approximation theorem or probabilistic inference. The classic universal approximation theorem concerns the capacity of feedforward neural networks with a single hidden layer of finite size to approximate continuous functions.',
+    'In 1989, the first proof was published by George Cybenko for sigmoid activation functions and was generalised to feed-forward multi-layer architectures in 1991 by Kurt Hornik.Recent work also showed that universal approximation also holds for non-bounded activation functions such as the rectified linear unit.',
+    'he universal approximation theorem for deep neural networks concerns the capacity of networks with bounded width but the depth is allowed to grow. Lu et al. proved that if the width of a deep neural network with ReLU activation is strictly larger than the input dimension, then the network can approximate any Lebesgue integrable function',
+    'The probabilistic interpretation[24] derives from the field of machine learning. It features inference, as well as the optimization concepts of training and testing, related to fitting and generalization, respectively',
+    'More specifically, the probabilistic interpretation considers the activation nonlinearity as a cumulative distribution function. The probabilistic interpretation led to the introduction of dropout as regularizer in neural networks.',
+    'The probabilistic interpretation was introduced by researchers including Hopfield, Widrow and Narendra and popularized in surveys such as the one by Bishop. The term Deep Learning was introduced to the machine learning community by Rina Dechter in 1986',
+    'The first general, working learning algorithm for supervised, deep, feedforward, multilayer perceptrons was published by Alexey Ivakhnenko and Lapa in 1965.[32] A 1971 paper described already a deep network with 8 layers trained by the group method of data handling algorithm.',
+    'Other deep learning working architectures, specifically those built for computer vision, began with the Neocognitron introduced by Kunihiko Fukushima in 1980.[34] In 1989, Yann LeCun et al. applied the standard backpropagation algorithm',
+    'By 1991 such systems were used for recognizing isolated 2-D hand-written digits, while recognizing 3-D objects was done by matching 2-D images with a handcrafted 3-D object model. Weng et al. suggested that a human brain does not use a monolithic 3-D object model and in 1992 they published Cresceptron',
+    'Because it directly used natural images, Cresceptron started the beginning of general-purpose visual learning for natural 3D worlds. Cresceptron is a cascade of layers similar to Neocognitron. But while Neocognitron required a human programmer to hand-merge features, Cresceptron learned an open number of features in each layer without supervision',
+    'Cresceptron segmented each learned object from a cluttered scene through back-analysis through the network. Max pooling, now often adopted by deep neural networks (e.g. ImageNet tests), was first used in Cresceptron to reduce the position resolution by a factor of (2x2) to 1 through the cascade for better generalization',
+    'In 1994, André de Carvalho, together with Mike Fairhurst and David Bisset, published experimental results of a multi-layer boolean neural network, also known as a weightless neural network, composed of a 3-layers self-organising feature extraction neural network module (SOFT) followed by a multi-layer classification neural network module (GSN)',
+    'n 1995, Brendan Frey demonstrated that it was possible to train a network containing six fully connected layers and several hundred hidden units using the wake-sleep algorithm, co-developed with Peter Dayan and Hinton. Many factors contribute to the slow speed, including the vanishing gradient problem analyzed in 1991 by Sepp Hochreiter',
+    'Simpler models that use task-specific handcrafted features such as Gabor filters and support vector machines (SVMs) were a popular choice in the 1990s and 2000s, because of artificial neural network\'s (ANN) computational cost and a lack of understanding of how the brain wires its biological networks.',
+    'Both shallow and deep learning (e.g., recurrent nets) of ANNs have been explored for many years.[47][48][49] These methods never outperformed non-uniform internal-handcrafting Gaussian mixture model/Hidden Markov model (GMM-HMM) technology based on generative models of speech trained discriminatively.',
+    'Key difficulties have been analyzed, including gradient diminishing[45] and weak temporal correlation structure in neural predictive models.[51][52] Additional difficulties were the lack of training data and limited computing power. Most speech recognition researchers moved away from neural nets to pursue generative modeling.',
+    'An exception was at SRI International in the late 1990s. Funded by the US government\'s NSA and DARPA, SRI studied deep neural networks in speech and speaker recognition. The speaker recognition team led by Larry Heck achieved the first significant success with deep neural networks.',
+    'While SRI experienced success with deep neural networks in speaker recognition, they were unsuccessful in demonstrating similar success in speech recognition. The principle of elevating "raw" features over hand-crafted optimization was first explored successfully in the architecture of deep autoencoder on the "raw" spectrogram'
+]
+
+
+@functools.lru_cache(maxsize=None)
+def http_session():
+    """Returns the HTTP session shared by the downloads, so that connections to a host are kept alive and reused"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+
+def cached_download(url, filename):
+    """Downloads `url` once into a cache directory keyed by the URL and returns the path of the local copy"""
+    dest = CACHE_ROOT / hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] / filename
+    if not dest.exists():
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(dest.name + '.tmp')
+        with http_session().get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with tmp.open('wb') as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+        os.replace(tmp, dest)
+    return dest
+
+
+@functools.lru_cache(maxsize=None)
+def cached_pretrained_file(url):
+    """Resolves a pretrained model file through the transformers cache under `CACHE_ROOT`, once per process so that
+    later lookups of the same file skip the HTTP metadata check"""
+    from transformers.file_utils import get_from_cache
+    return get_from_cache(url, cache_dir=CACHE_ROOT)
+
+
+def cached_glue_task(url, task_name):
+    """Downloads a GLUE task archive once, extracts its training split and returns the directory holding it"""
+    task_dir = CACHE_ROOT / hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] / task_name
+    if not (task_dir / 'train.tsv').exists():
+        with ZipFile(cached_download(url, task_name + '.zip')) as zipObj:
+            zipObj.extract(task_name + '/train.tsv', task_dir.parent)
+    return task_dir
+
+
+def read_tsv_columns(path, *columns):
+    """Reads the given columns of a GLUE TSV file into a list of tuples, without building per-row example objects.
+    The parsed columns are pickled next to the file so that later sessions skip the parse."""
+    path = Path(path)
+    cache_path = path.with_name(f'{path.stem}.{"_".join(columns)}.pkl')
+    if cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+        with cache_path.open('rb') as f:
+            return pickle.load(f)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter='\t', quotechar=None)
+        header = next(reader)
+        indices = [header.index(column) for column in columns]
+        rows = [tuple(row[index] for index in indices) for row in reader]
+    tmp = cache_path.with_name(cache_path.name + '.tmp')
+    with tmp.open('wb') as f:
+        pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+    return rows
+
+
+def cached_baseline(name, texts, encode_batch, options):
+    """Encodes `texts` (or pairs of texts) with a Python baseline `encode_batch` function returning one output per
+    text and pickles the outputs under the cache, keyed by `name`, the texts themselves, the versions of the baseline
+    libraries and the `repr` of `options`. `options` must cover everything else the outputs depend on: the baseline
+    tokenizer settings, its model files and the encoding options."""
+    digest = hashlib.sha1(name.encode('utf-8'))
+    for library in ('transformers', 'sentencepiece'):
+        # The baseline modules are imported by the test building the baseline
+        if library in sys.modules:
+            digest.update(f'{library}={getattr(sys.modules[library], "__version__", "")}'.encode('utf-8'))
+    digest.update(repr(options).encode('utf-8'))
+    for text in texts:
+        # A pair of texts is hashed as its two texts joined by a separator no text contains
+        digest.update(('\x01'.join(text) if isinstance(text, tuple) else text).encode('utf-8'))
+        digest.update(b'\0')
+    cache_path = CACHE_ROOT / 'baselines' / f'{name}-{digest.hexdigest()[:16]}.pkl'
+    if cache_path.exists():
+        with cache_path.open('rb') as f:
+            return pickle.load(f)
+    outputs = encode_batch(texts)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(cache_path.name + '.tmp')
+    with tmp.open('wb') as f:
+        pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+    return outputs
+
+
+def tokenizer_options(tokenizer, model_name):
+    """Describes a pretrained transformers tokenizer for a baseline cache key: its class, the plain values of its init
+    kwargs (the options it was built with) and the names of its cached vocabulary files, which change with the
+    remote files"""
+    init_kwargs = sorted((key, value) for key, value in tokenizer.init_kwargs.items()
+                         if isinstance(value, (str, int, float, bool, type(None))))
+    vocab_files = sorted(os.path.basename(cached_pretrained_file(urls[model_name]))
+                         for urls in tokenizer.pretrained_vocab_files_map.values() if model_name in urls)
+    return type(tokenizer).__name__, init_kwargs, vocab_files
+
+
+def spawn_process_pool(initializer, initargs):
+    """Returns a process pool over all cores whose workers are spawned rather than forked: forking once rayon or the
+    thread pools have started threads can deadlock. Each worker runs `initializer(*initargs)` once, the workers only
+    start with the first submitted task."""
+    return ProcessPoolExecutor(os.cpu_count(), mp_context=multiprocessing.get_context('spawn'),
+                               initializer=initializer, initargs=initargs)
+
+
+def encode_in_processes(pool, encode_chunk, items, chunk_size, length=len):
+    """Encodes `items` in chunks of `chunk_size` with `encode_chunk` on a process pool and returns the outputs in the
+    input order. The longest items, as measured by `length`, go first so that the last chunks handed out are the
+    cheapest ones."""
+    order = sorted(range(len(items)), key=lambda idx: length(items[idx]), reverse=True)
+    sorted_items = [items[idx] for idx in order]
+    chunks = [sorted_items[start:start + chunk_size] for start in range(0, len(sorted_items), chunk_size)]
+    outputs = [None] * len(items)
+    for idx, output in zip(order, itertools.chain.from_iterable(pool.map(encode_chunk, chunks))):
+        outputs[idx] = output
+    return outputs
+
+
+def encode_deduplicated(encode_list, texts, longest_first=True):
+    """Encodes each distinct text once with `encode_list` and scatters the encodings back to the input order"""
+    unique_texts = list(dict.fromkeys(texts))
+    if longest_first:
+        # Longest texts first so that the last batches handed to the worker threads are the cheapest ones
+        unique_texts.sort(key=len, reverse=True)
+    encodings = dict(zip(unique_texts, encode_list(unique_texts)))
+    return [encodings[text] for text in texts]
+
+
+def encode_list_sharded(tokenizers, texts, thread_pool, num_threads, **kwargs):
+    """Splits `texts` into one contiguous chunk per tokenizer instance and encodes the chunks concurrently, each
+    instance with its own pool of `num_threads` threads. A single instance encodes the whole batch directly."""
+    if len(tokenizers) == 1:
+        return tokenizers[0].encode_list(texts, num_threads=num_threads, **kwargs)
+    chunk_size = math.ceil(len(texts) / len(tokenizers))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+
+    def encode_chunk(tokenizer, chunk):
+        return tokenizer.encode_list(chunk, num_threads=num_threads, **kwargs)
+
+    return list(itertools.chain.from_iterable(thread_pool.map(encode_chunk, tokenizers, chunks)))
+
+
+def unique_ratio(texts):
+    """Share of distinct texts in a batch, the upper bound of the work saved by `encode_deduplicated`"""
+    return len(set(texts)) / len(texts) if texts else 1.0
+
+
+def to_padded_array(sequences, pad_id=0, num_columns=None, dtype=np.int64):
+    """Right-pads a batch of token id lists to `num_columns` (the longest sequence by default) into an array"""
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    if num_columns is None:
+        num_columns = int(lengths.max()) if len(sequences) else 0
+    # All ids are gathered into one flat buffer and scattered through a row-major mask, with no per-row Python work
+    flat_ids = np.fromiter(itertools.chain.from_iterable(sequences), dtype=dtype, count=int(lengths.sum()))
+    input_ids = np.full((len(sequences), num_columns), pad_id, dtype=dtype)
+    input_ids[np.arange(num_columns) < lengths[:, None]] = flat_ids
+    return input_ids
+
+
+def to_padded_tensor(sequences, pad_id=0):
+    """Right-pads a batch of token id lists to the longest sequence into a contiguous int64 tensor"""
+    import torch
+    return torch.from_numpy(to_padded_array(sequences, pad_id))
+
+
+def mismatched_rows(sequences, other_sequences):
+    """Returns the indices of the rows that differ between two equally sized batches of token id lists"""
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    other_lengths = np.fromiter(map(len, other_sequences), dtype=np.int64, count=len(other_sequences))
+    if np.array_equal(lengths, other_lengths):
+        # Rows of equal lengths are compared as two flat buffers, the differing positions are mapped back to their
+        # rows through the row end offsets
+        num_ids = int(lengths.sum())
+        flat_ids = np.fromiter(itertools.chain.from_iterable(sequences), dtype=np.int32, count=num_ids)
+        other_flat_ids = np.fromiter(itertools.chain.from_iterable(other_sequences), dtype=np.int32, count=num_ids)
+        return np.unique(np.searchsorted(np.cumsum(lengths), np.flatnonzero(flat_ids != other_flat_ids),
+                                         side='right'))
+    num_columns = int(max(lengths.max(initial=0), other_lengths.max(initial=0)))
+    # Pads with an id no vocabulary produces so that sequences of different lengths never compare equal
+    return np.flatnonzero(np.any(to_padded_array(sequences, -1, num_columns, np.int32)
+                                 != to_padded_array(other_sequences, -1, num_columns, np.int32), axis=1))
+
+
+def mismatch_span(rust_tokens, python_tokens, max_width=16):
+    """Returns the start and the Rust / Python ends of the span where two token id sequences differ,
+    padded with one token of context on each side and capped to `max_width` tokens so that only a narrow window
+    gets decoded for the failure message"""
+    # Equal sequences, or one extending the other, are settled by a single list comparison
+    common_length = min(len(rust_tokens), len(python_tokens))
+    if rust_tokens[:common_length] == python_tokens[:common_length]:
+        start = max(common_length - 1, 0)
+        return start, min(len(rust_tokens), start + max_width), min(len(python_tokens), start + max_width)
+
+    num_columns = max(len(rust_tokens), len(python_tokens))
+
+    def first_mismatch(rust_sequence, python_sequence):
+        # Distinct pad ids make the end of the shorter sequence count as a mismatch
+        rust_ids = to_padded_array([rust_sequence], -1, num_columns)[0]
+        python_ids = to_padded_array([python_sequence], -2, num_columns)[0]
+        mismatch = rust_ids != python_ids
+        return int(mismatch.argmax()) if mismatch.any() else num_columns
+
+    prefix_length = first_mismatch(rust_tokens, python_tokens)
+    suffix_length = first_mismatch(rust_tokens[::-1], python_tokens[::-1])
+    suffix_length = min(suffix_length, common_length - prefix_length)
+    start = max(prefix_length - 1, 0)
+    return (start,
+            min(len(rust_tokens) - suffix_length + 1, start + max_width),
+            min(len(python_tokens) - suffix_length + 1, start + max_width))